@@ -9,29 +9,36 @@ files to html. To use this file, simple import it and call the needed methods.
 import asciidoc
 import os
 
-def convert_adoc_to_html(input_file, output_file):
+def render_adoc_to_html(input_file):
     """
-    Convert an AsciiDoc (.adoc) file to HTML.
+    Render an AsciiDoc (.adoc) file to a standalone HTML page.
+
+    Args:
+        input_file (str): Path to the AsciiDoc file.
+
+    Returns:
+        str: The HTML page.
+
+    Raises:
+        FileNotFoundError: If the input file doesn't exist.
     """
-    try:
-        # Check if input file exists
-        if not os.path.exists(input_file):
-            print(f"Error: Input file '{input_file}' does not exist.")
-            return
-        
-        # Check if input file has .adoc extension
-        if not input_file.lower().endswith('.adoc'):
-            print("Warning: Input file does not have a .adoc extension.")
-        
-        # Read the AsciiDoc file
-        with open(input_file, 'r', encoding='utf-8') as adoc_file:
-            adoc_content = adoc_file.read()
-        
-        # Convert AsciiDoc to HTML
-        html_content = asciidoc.convert(adoc_content, backend='html5')
-        
-        # Create basic HTML template
-        html_template = f"""<!DOCTYPE html>
+    # Check if input file exists
+    if not os.path.exists(input_file):
+        raise FileNotFoundError(f"Input file '{input_file}' does not exist.")
+    
+    # Check if input file has .adoc extension
+    if not input_file.lower().endswith('.adoc'):
+        print("Warning: Input file does not have a .adoc extension.")
+    
+    # Read the AsciiDoc file
+    with open(input_file, 'r', encoding='utf-8') as adoc_file:
+        adoc_content = adoc_file.read()
+    
+    # Convert AsciiDoc to HTML
+    html_content = asciidoc.convert(adoc_content, backend='html5')
+    
+    # Create basic HTML template
+    html_template = f"""<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
@@ -62,19 +69,12 @@ def convert_adoc_to_html(input_file, output_file):
 </body>
 </html>
 """
-        
-        # Write to output HTML file
-        with open(output_file, 'w', encoding='utf-8') as html_file:
-            html_file.write(html_template)
-        
-        print(f"Successfully converted '{input_file}' to '{output_file}'")
-        
-    except Exception as e:
-        print(f"An error occurred: {str(e)}")
+    return html_template
 
-def convert_asciidoc_to_html(input_file, output_file):
+
+def convert_adoc_to_html(input_file, output_file):
     """
-    Convert an AsciiDoc (.asciidoc) file to HTML.
+    Convert an AsciiDoc (.adoc) file to HTML.
     """
     try:
         # Check if input file exists
@@ -82,19 +82,47 @@ def convert_asciidoc_to_html(input_file, output_file):
             print(f"Error: Input file '{input_file}' does not exist.")
             return
         
-        # Check if input file has .asciidoc extension
-        if not input_file.lower().endswith('.asciidoc'):
-            print("Warning: Input file does not have a .asciidoc extension.")
+        html_template = render_adoc_to_html(input_file)
         
-        # Read the AsciiDoc file
-        with open(input_file, 'r', encoding='utf-8') as asciidoc_file:
-            asciidoc_content = asciidoc_file.read()
+        # Write to output HTML file
+        with open(output_file, 'w', encoding='utf-8') as html_file:
+            html_file.write(html_template)
         
-        # Convert AsciiDoc to HTML
-        html_content = asciidoc.convert(asciidoc_content, backend='html5')
+        print(f"Successfully converted '{input_file}' to '{output_file}'")
         
-        # Create basic HTML template
-        html_template = f"""<!DOCTYPE html>
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
+
+def render_asciidoc_to_html(input_file):
+    """
+    Render an AsciiDoc (.asciidoc) file to a standalone HTML page.
+
+    Args:
+        input_file (str): Path to the AsciiDoc file.
+
+    Returns:
+        str: The HTML page.
+
+    Raises:
+        FileNotFoundError: If the input file doesn't exist.
+    """
+    # Check if input file exists
+    if not os.path.exists(input_file):
+        raise FileNotFoundError(f"Input file '{input_file}' does not exist.")
+    
+    # Check if input file has .asciidoc extension
+    if not input_file.lower().endswith('.asciidoc'):
+        print("Warning: Input file does not have a .asciidoc extension.")
+    
+    # Read the AsciiDoc file
+    with open(input_file, 'r', encoding='utf-8') as asciidoc_file:
+        asciidoc_content = asciidoc_file.read()
+    
+    # Convert AsciiDoc to HTML
+    html_content = asciidoc.convert(asciidoc_content, backend='html5')
+    
+    # Create basic HTML template
+    html_template = f"""<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
@@ -125,6 +153,20 @@ def convert_asciidoc_to_html(input_file, output_file):
 </body>
 </html>
 """
+    return html_template
+
+
+def convert_asciidoc_to_html(input_file, output_file):
+    """
+    Convert an AsciiDoc (.asciidoc) file to HTML.
+    """
+    try:
+        # Check if input file exists
+        if not os.path.exists(input_file):
+            print(f"Error: Input file '{input_file}' does not exist.")
+            return
+        
+        html_template = render_asciidoc_to_html(input_file)
         
         # Write to output HTML file
         with open(output_file, 'w', encoding='utf-8') as html_file:
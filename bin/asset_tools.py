@@ -0,0 +1,201 @@
+#!/bin/python3
+"""
+asset_tools.py
+
+This file contains the tools needed to publish the non-document files (images, attachments,
+PDFs, ...) referenced by generated pages. Assets are stored once in a content-addressed
+folder of the output (blobs named by the hash of their contents) and the references in each
+page are rewritten to point at the blob, so identical files shared by many pages or
+repositories are stored and uploaded once and unchanged assets are skipped on rebuild.
+"""
+
+import os
+from urllib.parse import urlsplit, unquote, quote
+from .griddle_utils import hash_file, output_text
+
+# Folder (inside the output folder) holding the content-addressed asset blobs.
+ASSET_FOLDER = "_assets"
+
+# Extensions of referenced files which are documents (or pages) rather than assets.
+DOCUMENT_EXTENSIONS = {"md", "adoc", "asciidoc", "html", "htm"}
+
+# Extensions of linked files which are converted to pages of their own, so links to them are
+# not assets even though embedding them (e.g. the PDF viewer page) is.
+LINKED_DOCUMENT_EXTENSIONS = DOCUMENT_EXTENSIONS | {"pdf"}
+
+# Tags and attributes which may reference an asset.
+ASSET_ATTRIBUTES = {
+    "img": "src",
+    "a": "href",
+    "iframe": "src",
+    "embed": "src",
+    "source": "src",
+    "video": "src",
+    "audio": "src",
+    "object": "data",
+}
+
+
+class AssetStore:
+    """
+    Content-addressed store of the assets referenced by the generated pages.
+    """
+
+    def __init__(self, writer, catalog=None):
+        """
+        Create the store.
+
+        Args:
+            writer (DirectoryWriter or PackWriter): Writer of the generated site, or None when
+                the store is only used to rewrite references (e.g. in a worker process).
+            catalog (DocumentCatalog, optional): Catalog used to remember asset hashes between builds.
+        """
+        self.writer = writer
+        self.catalog = catalog
+        self.stored = 0
+        self.reused = 0
+        self.references = 0
+
+    def blob_path(self, digest, ext):
+        """
+        Get the path of an asset blob relative to the site root.
+
+        Args:
+            digest (str): Hex digest of the asset contents.
+            ext (str): Extension of the asset, including the leading dot.
+
+        Returns:
+            str: Relative path of the blob.
+        """
+        return f"{ASSET_FOLDER}/{digest[:2]}/{digest}{ext.lower()}"
+
+    def digest(self, asset_path):
+        """
+        Get the content hash of an asset, using the catalog to avoid rehashing unchanged files.
+
+        Args:
+            asset_path (str): Path to the asset file.
+
+        Returns:
+            str: Hex digest of the asset contents.
+        """
+        if self.catalog is not None:
+            return self.catalog.get_asset_hash(asset_path)
+        return hash_file(asset_path)
+
+    def rewrite(self, soup, source_file, html_path, input_root):
+        """
+        Point the asset references of a generated page at their blobs.
+
+        References to files outside the input folder are left untouched, so a document can't
+        publish arbitrary files of the build host (e.g. '../../.env').
+
+        Args:
+            soup (BeautifulSoup): Parsed generated page, modified in place.
+            source_file (str): Path of the source document, which relative references are resolved against.
+            html_path (str): Path of the generated page relative to the site root.
+            input_root (str): The build input folder, which every asset must be inside of.
+
+        Returns:
+            list of tuple: (asset_path, blob) pairs of the referenced assets, to be stored with store().
+        """
+        source_dir = os.path.dirname(source_file)
+        html_dir = os.path.dirname(html_path)
+        assets = []
+
+        for tag in soup.find_all(list(ASSET_ATTRIBUTES)):
+            attribute = ASSET_ATTRIBUTES[tag.name]
+            if not tag.has_attr(attribute):
+                continue
+            asset_path, suffix = resolve_asset_reference(tag[attribute], source_dir, tag.name == "a")
+            if asset_path is None:
+                continue
+            if not is_inside_folder(asset_path, input_root):
+                output_text(f"Ignoring '{tag[attribute]}' in '{source_file}': it is outside the input folder",
+                            "warning")
+                continue
+
+            blob = self.blob_path(self.digest(asset_path), os.path.splitext(asset_path)[1])
+            tag[attribute] = quote(os.path.relpath(blob, html_dir or ".").replace("\\", "/")) + suffix
+            assets.append((asset_path, blob))
+
+        return assets
+
+    def store(self, asset_path, blob):
+        """
+        Store an asset in the site unless an identical file is already stored.
+
+        Args:
+            asset_path (str): Path to the asset file.
+            blob (str): Path of the blob relative to the site root, as returned by rewrite().
+        """
+        self.references += 1
+        if self.writer.exists(blob):
+            self.reused += 1
+            return
+
+        self.writer.copy_file(asset_path, blob)
+        self.stored += 1
+
+    def summary(self):
+        """
+        Describe the published assets.
+
+        Returns:
+            str: Human readable summary of the asset references and blobs.
+        """
+        return (f"Assets: {self.references} references, {self.stored} stored, "
+                f"{self.reused} already stored")
+
+
+def resolve_asset_reference(reference, source_dir, is_link=False):
+    """
+    Resolve a reference found in a page to a local asset file.
+
+    Args:
+        reference (str): Value of the referencing attribute.
+        source_dir (str): Folder of the source document the reference is relative to.
+        is_link (bool, optional): Whether the reference is a link (<a href>). Links to documents
+            which are converted to pages (e.g. PDFs) are left to point at the source, like links
+            between Markdown documents, while embedded PDFs are assets.
+
+    Returns:
+        tuple: (asset_path, suffix) where suffix is the query/fragment to keep, or (None, None)
+            if the reference is external, not a file, or points at another document.
+    """
+    parts = urlsplit(reference)
+    if parts.scheme or parts.netloc or not parts.path or parts.path.startswith("/"):
+        return None, None
+
+    asset_path = os.path.normpath(os.path.join(source_dir, unquote(parts.path)))
+    ext = os.path.splitext(asset_path)[1].lstrip(".").lower()
+    document_extensions = LINKED_DOCUMENT_EXTENSIONS if is_link else DOCUMENT_EXTENSIONS
+    if ext in document_extensions or not os.path.isfile(asset_path):
+        return None, None
+
+    suffix = ""
+    if parts.query:
+        suffix += "?" + parts.query
+    if parts.fragment:
+        suffix += "#" + parts.fragment
+    return asset_path, suffix
+
+
+def is_inside_folder(path, folder):
+    """
+    Check whether a path is inside a folder once symbolic links are resolved.
+
+    Args:
+        path (str): The path to check.
+        folder (str): The folder it must be inside of.
+
+    Returns:
+        bool: True if the path is the folder or inside it.
+    """
+    path = os.path.realpath(path)
+    folder = os.path.realpath(folder)
+    try:
+        return os.path.commonpath([path, folder]) == folder
+    except ValueError:
+        # Paths on different drives.
+        return False
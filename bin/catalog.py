@@ -0,0 +1,363 @@
+#!/bin/python3
+"""
+catalog.py
+
+This file contains the persistent document catalog used by the GRIDDLE build stages. The
+catalog is a SQLite database which records every discovered document (source, repository,
+content hash, output path, title, summary, headings, outgoing links, render duration and status) so
+later stages can query it instead of rescanning the filesystem, and so successive builds can
+report what changed and what is slow.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from .griddle_utils import ensure_path_exists, hash_file, METADATA_FOLDER
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS documents (
+    source TEXT PRIMARY KEY,
+    repo TEXT,
+    hash TEXT,
+    output TEXT,
+    title TEXT,
+    headings TEXT,
+    links TEXT,
+    render_seconds REAL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    error TEXT,
+    summary TEXT,
+    changed_build INTEGER,
+    seen_build INTEGER
+);
+CREATE TABLE IF NOT EXISTS assets (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_output ON documents (output);
+CREATE INDEX IF NOT EXISTS documents_seen ON documents (seen_build, status);
+"""
+
+# Columns which hold JSON encoded lists.
+JSON_COLUMNS = ("headings", "links")
+
+
+class DocumentCatalog:
+    """
+    SQLite backed catalog of the documents in a GRIDDLE build.
+
+    Writes are buffered and committed in batches of `batch_size` rows (or when flush() is
+    called) to keep the per-document overhead low on large builds.
+    """
+
+    def __init__(self, db_path, batch_size=500):
+        """
+        Open (or create) the catalog database.
+
+        Args:
+            db_path (str): Path to the SQLite database file.
+            batch_size (int, optional): Number of buffered updates per transaction. Defaults to 500.
+        """
+        ensure_path_exists(db_path)
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self._pending = []
+        self._pending_assets = {}
+        self.connection = sqlite3.connect(db_path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+
+    def close(self):
+        """
+        Flush any buffered updates and close the database.
+        """
+        self.flush()
+        self.connection.close()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Context manager which runs the enclosed statements in a single transaction.
+        """
+        try:
+            yield self.connection
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+
+    def begin_build(self):
+        """
+        Register a new build.
+
+        Returns:
+            int: The id of the new build, used to tag the documents seen by it.
+        """
+        with self.transaction() as conn:
+            cursor = conn.execute("INSERT INTO builds (started) VALUES (?)", (time.time(),))
+        return cursor.lastrowid
+
+    def record_discovered(self, documents, build_id):
+        """
+        Insert or refresh the discovered documents of a build in one transaction.
+
+        Documents whose hash differs from the catalog (or which are new) are marked as changed
+        in this build.
+
+        Args:
+            documents (list of dict): Records with 'source', 'repo', 'hash' and 'output' keys.
+            build_id (int): The id of the current build.
+        """
+        rows = [(doc["source"], doc.get("repo"), doc["hash"], doc["output"], build_id, build_id)
+                for doc in documents]
+        with self.transaction() as conn:
+            conn.executemany(
+                """
+                INSERT INTO documents (source, repo, hash, output, status, changed_build, seen_build)
+                VALUES (?, ?, ?, ?, 'pending', ?, ?)
+                ON CONFLICT (source) DO UPDATE SET
+                    changed_build = CASE WHEN documents.hash IS excluded.hash
+                                         THEN documents.changed_build ELSE excluded.changed_build END,
+                    repo = excluded.repo,
+                    hash = excluded.hash,
+                    output = excluded.output,
+                    status = 'pending',
+                    seen_build = excluded.seen_build
+                """,
+                rows
+            )
+
+    def record_rendered(self, source, status, render_seconds=None, title=None, headings=None, links=None,
+                        error=None, summary=None):
+        """
+        Buffer the render results of a document. Buffered results are committed in batches.
+
+        Args:
+            source (str): Source path of the document.
+            status (str): Render status: 'ok', 'failed' or 'quarantined'.
+            render_seconds (float, optional): Time taken to render the document.
+            title (str, optional): Document title.
+            headings (list of str, optional): Document headings.
+            links (list of str, optional): Outgoing links of the document.
+            error (str, optional): Reason the document failed to render.
+            summary (str, optional): First paragraph of the document.
+        """
+        self._pending.append((status, render_seconds, title,
+                              json.dumps(headings or []), json.dumps(links or []), error, summary, source))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Commit all buffered render results and asset hashes.
+        """
+        if not self._pending and not self._pending_assets:
+            return
+        with self.transaction() as conn:
+            conn.executemany(
+                """
+                UPDATE documents SET status = ?, render_seconds = ?, title = ?, headings = ?, links = ?,
+                    error = ?, summary = ?
+                WHERE source = ?
+                """,
+                self._pending
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO assets (path, size, mtime, hash) VALUES (?, ?, ?, ?)",
+                [(path,) + entry for path, entry in self._pending_assets.items()]
+            )
+        self._pending = []
+        self._pending_assets = {}
+
+    def get_asset_hash(self, asset_path):
+        """
+        Get the content hash of an asset, only rehashing it if its size or modification time
+        changed since it was last recorded.
+
+        Args:
+            asset_path (str): Path to the asset file.
+
+        Returns:
+            str: Hex digest of the asset contents.
+        """
+        path = os.path.abspath(asset_path)
+        stat = os.stat(path)
+
+        pending = self._pending_assets.get(path)
+        if pending and pending[:2] == (stat.st_size, stat.st_mtime):
+            return pending[2]
+
+        row = self.connection.execute("SELECT size, mtime, hash FROM assets WHERE path = ?", (path,)).fetchone()
+        if row and (row["size"], row["mtime"]) == (stat.st_size, stat.st_mtime):
+            return row["hash"]
+
+        digest = hash_file(path)
+        self._pending_assets[path] = (stat.st_size, stat.st_mtime, digest)
+        if len(self._pending_assets) >= self.batch_size:
+            self.flush()
+        return digest
+
+    def upsert_documents(self, documents, build_id):
+        """
+        Insert or replace complete document records (e.g. from shard metadata) in one transaction.
+
+        Args:
+            documents (list of dict): Full document records as produced by a build.
+            build_id (int): The id of the current build.
+        """
+        self.record_discovered(documents, build_id)
+        for doc in documents:
+            self.record_rendered(doc["source"], doc.get("status", "ok"), doc.get("render_seconds"),
+                                 doc.get("title"), doc.get("headings"), doc.get("links"), doc.get("error"),
+                                 doc.get("summary"))
+        self.flush()
+
+    def prune(self, build_id):
+        """
+        Remove the documents which were not seen by the given build.
+
+        Args:
+            build_id (int): The id of the current build.
+
+        Returns:
+            list of str: Source paths of the removed documents.
+        """
+        self.flush()
+        removed = [row["source"] for row in self.connection.execute(
+            "SELECT source FROM documents WHERE seen_build IS NOT ? ORDER BY source", (build_id,))]
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM documents WHERE seen_build IS NOT ?", (build_id,))
+        return removed
+
+    def get_documents(self, status="ok"):
+        """
+        Get the documents with a given status, ordered by output path.
+
+        Args:
+            status (str, optional): Status to filter on, or None for all documents. Defaults to 'ok'.
+
+        Returns:
+            list of dict: Document records.
+        """
+        self.flush()
+        if status is None:
+            rows = self.connection.execute("SELECT * FROM documents ORDER BY output")
+        else:
+            rows = self.connection.execute("SELECT * FROM documents WHERE status = ? ORDER BY output", (status,))
+        return [_row_to_dict(row) for row in rows]
+
+    def get_render_seconds(self):
+        """
+        Get the render durations recorded for successfully rendered documents.
+
+        Returns:
+            dict: Render seconds keyed by source path.
+        """
+        self.flush()
+        return {row["source"]: row["render_seconds"] for row in self.connection.execute(
+            "SELECT source, render_seconds FROM documents WHERE status = 'ok' AND render_seconds IS NOT NULL")}
+
+    def get_quarantined(self):
+        """
+        Get the documents which are quarantined from builds until their content changes.
+
+        Returns:
+            dict: Content hashes of the quarantined documents keyed by source path.
+        """
+        self.flush()
+        return {row["source"]: row["hash"] for row in self.connection.execute(
+            "SELECT source, hash FROM documents WHERE status = 'quarantined'")}
+
+    def output_paths(self):
+        """
+        Get the output paths of all documents with a page, which includes the placeholder
+        pages of failed and quarantined documents.
+
+        Returns:
+            list of str: Output paths relative to the output folder.
+        """
+        self.flush()
+        return [row["output"] for row in self.connection.execute(
+            "SELECT output FROM documents WHERE status != 'pending' ORDER BY output")]
+
+    def changed_documents(self, build_id):
+        """
+        Get the documents which were new or whose content changed in the given build.
+
+        Args:
+            build_id (int): The id of the build.
+
+        Returns:
+            list of str: Source paths of the changed documents.
+        """
+        self.flush()
+        return [row["source"] for row in self.connection.execute(
+            "SELECT source FROM documents WHERE changed_build = ? ORDER BY source", (build_id,))]
+
+    def slowest_documents(self, limit=10):
+        """
+        Get the documents which took the longest to render.
+
+        Args:
+            limit (int, optional): Maximum number of documents to return. Defaults to 10.
+
+        Returns:
+            list of tuple: (source, render_seconds) pairs, slowest first.
+        """
+        self.flush()
+        return [(row["source"], row["render_seconds"]) for row in self.connection.execute(
+            "SELECT source, render_seconds FROM documents WHERE render_seconds IS NOT NULL "
+            "ORDER BY render_seconds DESC LIMIT ?", (limit,))]
+
+
+def default_catalog_path(output_folder, shard=None):
+    """
+    Get the default catalog location for a build.
+
+    Args:
+        output_folder (str): The build output folder.
+        shard (tuple, optional): (index, count) of a sharded build, which gets its own catalog.
+
+    Returns:
+        str: Path to the catalog database.
+    """
+    return shard_catalog_path(os.path.join(output_folder, METADATA_FOLDER, "catalog.db"), shard)
+
+
+def shard_catalog_path(catalog_path, shard=None):
+    """
+    Get the catalog used by one shard of a build, so concurrent shards never prune each
+    other's documents.
+
+    Args:
+        catalog_path (str): Path of the catalog of the whole build (e.g. 'catalog.db').
+        shard (tuple, optional): (index, count) of a sharded build.
+
+    Returns:
+        str: catalog_path for unsharded builds, else the shard's path (e.g. 'catalog_shard_1_of_2.db').
+    """
+    if shard is None:
+        return catalog_path
+    root, ext = os.path.splitext(catalog_path)
+    return f"{root}_shard_{shard[0]}_of_{shard[1]}{ext}"
+
+
+def _row_to_dict(row):
+    """
+    Convert a documents row into a dictionary, decoding the JSON columns.
+    """
+    document = dict(row)
+    for column in JSON_COLUMNS:
+        document[column] = json.loads(document[column]) if document[column] else []
+    return document
@@ -1,40 +1,15 @@
 #!/bin/python3
 """
-generate_nav.py: Generate HTML navigation from a folder of HTML files
+generate_nav.py: Generate HTML navigation from a list of generated HTML files
 Author: Antonius Torode
 Created: July 22, 2025
 """
 
 from collections import defaultdict
-from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional
 from bs4 import BeautifulSoup
 
 
-def get_all_html_files(folder_path: str) -> List[str]:
-    """
-    Collect all HTML files in the given folder and subdirectories.
-
-    Args:
-        folder_path (str): Path to the folder.
-
-    Returns:
-        List[str]: List of relative paths to HTML files.
-    """
-    try:
-        root_dir = Path(folder_path)
-        if not root_dir.exists():
-            raise FileNotFoundError(f"Folder '{folder_path}' does not exist.")
-        if not root_dir.is_dir():
-            raise NotADirectoryError(f"Path '{folder_path}' is not a directory.")
-
-        return [str(path.relative_to(root_dir)) for path in root_dir.rglob('*.html')]
-
-    except Exception as e:
-        print(f"Error getting HTML files: {str(e)}")
-        return []
-
-
 def print_html_file_list(html_files: List[str]) -> None:
     """
     Prints the list of HTML files for debugging.
@@ -47,12 +22,14 @@ def print_html_file_list(html_files: List[str]) -> None:
         print(f" - {file_path}")
 
 
-def generate_nav_html_from_list(html_files: List[str]) -> str:
+def generate_nav_html_from_list(html_files: List[str], doc_ids: Optional[Dict[str, str]] = None) -> str:
     """
     Generate nested HTML navigation structure from list of HTML file paths.
 
     Args:
         html_files (list[str]): List of relative HTML file paths.
+        doc_ids (dict[str, str], optional): Document ids keyed by HTML file path, added to the
+            links so the index can show their hover previews.
 
     Returns:
         str: HTML string of the navigation structure.
@@ -75,7 +52,9 @@ def generate_nav_html_from_list(html_files: List[str]) -> str:
         for key in sorted(structure.keys()):
             value = structure[key]
             if isinstance(value, dict) and 'path' in value:
-                html += f'<li><a href="#" data-url="{value["path"]}">{value["display"]}</a></li>'
+                doc_id = (doc_ids or {}).get(value["path"])
+                doc_id_attr = f' data-doc-id="{doc_id}"' if doc_id else ''
+                html += f'<li><a href="#" data-url="{value["path"]}"{doc_id_attr}>{value["display"]}</a></li>'
             else:
                 html += f'<li><span class="folder">{key}</span>'
                 html += '<ul>'
@@ -104,19 +83,18 @@ def format_html_pretty(html_str: str) -> str:
     return soup.prettify()
 
 
-def get_full_html_nav_block(input_folder):
+def get_nav_block_from_list(html_files: List[str], doc_ids: Optional[Dict[str, str]] = None) -> str:
     """
-    Generate a fully formatted HTML navigation block from HTML files in a folder.
+    Generate a fully formatted HTML navigation block from a known list of HTML files.
 
     Args:
-        input_folder (str): Path to the folder containing HTML files.
+        html_files (List[str]): List of HTML file paths relative to the output folder.
+        doc_ids (Dict[str, str], optional): Document ids keyed by HTML file path.
 
     Returns:
         str: Indented and formatted HTML navigation block as a string.
     """
-
-    html_files = get_all_html_files(input_folder)
-    nav_html = generate_nav_html_from_list(html_files)
+    nav_html = generate_nav_html_from_list(html_files, doc_ids)
     formatted_html = format_html_pretty(nav_html)
     return formatted_html
 
@@ -125,7 +103,7 @@ def main():
     """
     Test the navigation generation.
     """
-    print(get_full_html_nav_block("out_folder"))
+    print(get_nav_block_from_list(["repo/README.html", "repo/docs/guide.html", "repo/docs/api.html"]))
 
 if __name__ == "__main__":
     main()
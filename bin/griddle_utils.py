@@ -12,6 +12,11 @@ Many of the methods were taken and/or adapted from:
 import os
 import subprocess
 import shutil
+import hashlib
+from functools import lru_cache
+
+# Folder (inside the output folder) used for GRIDDLE build bookkeeping files.
+METADATA_FOLDER = ".griddle"
 
 def output_text(text, option="text"):
     """
@@ -157,6 +162,44 @@ def generate_nav_html(folder_path: str) -> str:
         return ""
 
 
+def hash_file(file_path, chunk_size=1 << 20):
+    """
+    Compute the SHA-256 hash of a file's contents.
+
+    Args:
+        file_path (str): Path to the file.
+        chunk_size (int, optional): Number of bytes to read at a time. Defaults to 1 MiB.
+
+    Returns:
+        str: Hex digest of the file contents.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def find_repo_root(directory):
+    """
+    Find the root of the Git repository containing a directory without invoking git.
+
+    Args:
+        directory (str): Directory to start searching from.
+
+    Returns:
+        str: Absolute path of the repository root, or None if the directory is not in a repository.
+    """
+    directory = os.path.abspath(directory)
+    if os.path.exists(os.path.join(directory, '.git')):
+        return directory
+    parent = os.path.dirname(directory)
+    if parent == directory:
+        return None
+    return find_repo_root(parent)
+
+
 def ensure_path_exists(file_path):
     """
     Ensures that all directories in the given file path exist.
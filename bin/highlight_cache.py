@@ -0,0 +1,234 @@
+#!/bin/python3
+"""
+highlight_cache.py
+
+This file contains a cache for the syntax highlighted code blocks produced by the markdown
+'codehilite' extension. Highlighted blocks are keyed by their language, highlighting options
+and a hash of the code, kept in memory for the current build and stored in a SQLite database
+between builds, so repeated snippets only cost a lookup. Pygments lexers are also reused
+instead of being recreated for every block.
+"""
+
+import hashlib
+import os
+import sqlite3
+import markdown
+from markdown.extensions import codehilite, fenced_code
+from .griddle_utils import ensure_path_exists, METADATA_FOLDER
+
+try:
+    import pygments
+    PYGMENTS_VERSION = pygments.__version__
+except ImportError:
+    PYGMENTS_VERSION = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS highlights (
+    key TEXT PRIMARY KEY,
+    html TEXT NOT NULL
+);
+"""
+
+
+class HighlightCache:
+    """
+    Two level (memory and SQLite) cache of highlighted code blocks.
+
+    New entries are written to the database in a single transaction by flush().
+    """
+
+    def __init__(self, db_path=None):
+        """
+        Create the cache.
+
+        Args:
+            db_path (str, optional): Path to the SQLite database used between builds. If None,
+                entries are only cached in memory.
+        """
+        self.memory = {}
+        self._pending = {}
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.connection = None
+        if db_path:
+            ensure_path_exists(db_path)
+            # A generous timeout lets several shards share one cache database.
+            self.connection = sqlite3.connect(db_path, timeout=30)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.executescript(SCHEMA)
+            self.connection.commit()
+
+    def get(self, key):
+        """
+        Look up a highlighted block.
+
+        Args:
+            key (str): Cache key of the block.
+
+        Returns:
+            str: The highlighted HTML, or None on a miss.
+        """
+        html = self.memory.get(key)
+        if html is not None:
+            self.memory_hits += 1
+            return html
+
+        if self.connection is not None:
+            row = self.connection.execute("SELECT html FROM highlights WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.disk_hits += 1
+                self.memory[key] = row[0]
+                return row[0]
+
+        self.misses += 1
+        return None
+
+    def put(self, key, html):
+        """
+        Store a highlighted block.
+
+        Args:
+            key (str): Cache key of the block.
+            html (str): The highlighted HTML.
+        """
+        self.memory[key] = html
+        self._pending[key] = html
+
+    def flush(self):
+        """
+        Write the new entries to the database.
+        """
+        if self.connection is None or not self._pending:
+            return
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO highlights (key, html) VALUES (?, ?)",
+                                        self._pending.items())
+        self._pending = {}
+
+    def close(self):
+        """
+        Flush the new entries and close the database.
+        """
+        self.flush()
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def take_stats(self):
+        """
+        Get the lookup counters and reset them, e.g. to report them from a worker process.
+
+        Returns:
+            tuple: (memory_hits, disk_hits, misses) since the last call.
+        """
+        stats = (self.memory_hits, self.disk_hits, self.misses)
+        self.memory_hits = self.disk_hits = self.misses = 0
+        return stats
+
+    def add_stats(self, stats):
+        """
+        Add lookup counters reported by take_stats() (e.g. from a worker process).
+
+        Args:
+            stats (tuple): (memory_hits, disk_hits, misses).
+        """
+        self.memory_hits += stats[0]
+        self.disk_hits += stats[1]
+        self.misses += stats[2]
+
+    def summary(self):
+        """
+        Describe the cache hit rate.
+
+        Returns:
+            str: Human readable summary of the cache lookups.
+        """
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        rate = 100.0 * hits / lookups if lookups else 0.0
+        return (f"Highlight cache: {hits}/{lookups} hits ({rate:.1f}%), "
+                f"{self.memory_hits} from memory, {self.disk_hits} from disk, {self.misses} misses")
+
+
+def highlight_cache_key(code, shebang):
+    """
+    Compute the cache key of a code block.
+
+    Args:
+        code (CodeHilite): The code block to highlight.
+        shebang (bool): Whether the language may be read from a shebang line.
+
+    Returns:
+        str: Hex digest of the versions, language, options and code.
+    """
+    options = sorted((name, value) for name, value in vars(code).items() if name != 'src')
+    digest = hashlib.sha256()
+    digest.update(repr((markdown.__version__, PYGMENTS_VERSION,
+                        shebang, options)).encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(code.src.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class CachedCodeHilite(codehilite.CodeHilite):
+    """
+    CodeHilite which looks highlighted blocks up in the installed HighlightCache.
+    """
+
+    cache = None
+
+    def hilite(self, shebang=True):
+        cache = CachedCodeHilite.cache
+        if cache is None:
+            return super().hilite(shebang)
+
+        key = highlight_cache_key(self, shebang)
+        html = cache.get(key)
+        if html is None:
+            html = super().hilite(shebang)
+            cache.put(key, html)
+        return html
+
+
+_get_lexer_by_name = getattr(codehilite, 'get_lexer_by_name', None)
+_lexers = {}
+
+
+def get_cached_lexer_by_name(alias, **options):
+    """
+    Drop-in replacement for pygments' get_lexer_by_name which reuses lexer instances.
+    """
+    key = (alias, repr(sorted(options.items())))
+    lexer = _lexers.get(key)
+    if lexer is None:
+        lexer = _get_lexer_by_name(alias, **options)
+        _lexers[key] = lexer
+    return lexer
+
+
+def install_highlight_cache(cache):
+    """
+    Make the markdown 'codehilite' and 'fenced_code' extensions use a highlight cache.
+
+    Args:
+        cache (HighlightCache): The cache to use, or None to disable caching.
+    """
+    CachedCodeHilite.cache = cache
+    codehilite.CodeHilite = CachedCodeHilite
+    fenced_code.CodeHilite = CachedCodeHilite
+    if _get_lexer_by_name is not None:
+        codehilite.get_lexer_by_name = get_cached_lexer_by_name
+
+
+def default_highlight_cache_path(output_folder):
+    """
+    Get the default location of the highlight cache database for a build.
+
+    Args:
+        output_folder (str): The build output folder.
+
+    Returns:
+        str: Path to the highlight cache database.
+    """
+    return os.path.join(output_folder, METADATA_FOLDER, "highlight_cache.db")
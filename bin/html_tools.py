@@ -5,6 +5,31 @@ html_tools.py
 This file contains various tools and methods needed for use for processing html files.
 """
 
+import os
+from html import escape
+
+NAV_MARKER = "<!-- AUTOGEN - NAVIGATION SECTION -->"
+
+# Suffix of the body-only fragments written next to the generated pages.
+FRAGMENT_SUFFIX = ".frag.html"
+
+# Maximum length of the summary (first paragraph) recorded for a document.
+SUMMARY_LENGTH = 300
+
+
+def insert_autogen_nav_section(content, replacement_str):
+    """
+    Replace the marker '<!-- AUTOGEN - NAVIGATION SECTION -->' in an HTML string with replacement_str.
+
+    Args:
+        content (str): HTML content containing the marker.
+        replacement_str (str): String to replace the marker with.
+
+    Returns:
+        str: The content with the marker replaced (unchanged if the marker is missing).
+    """
+    return content.replace(NAV_MARKER, replacement_str)
+
 
 def replace_autogen_nav_section(file_path, replacement_str):
     """
@@ -18,16 +43,159 @@ def replace_autogen_nav_section(file_path, replacement_str):
         FileNotFoundError: If the file doesn't exist.
         Exception: For other errors.
     """
-    marker = "<!-- AUTOGEN - NAVIGATION SECTION -->"
-
     with open(file_path, 'r', encoding='utf-8') as f:
         content = f.read()
 
-    if marker not in content:
+    if NAV_MARKER not in content:
         # Optional: raise error or just return
         return
 
-    new_content = content.replace(marker, replacement_str)
+    new_content = insert_autogen_nav_section(content, replacement_str)
 
     with open(file_path, 'w', encoding='utf-8') as f:
         f.write(new_content)
+
+
+def extract_html_metadata(soup, file_path):
+    """
+    Extract the metadata GRIDDLE records for a generated HTML document.
+
+    Args:
+        soup (BeautifulSoup): The parsed generated document.
+        file_path (str): Path to the generated HTML file, used as a fallback title.
+
+    Returns:
+        dict: A dictionary containing:
+            - 'title': Text of the first <h1>, else the <title>, else the file name.
+            - 'headings': List of heading texts (h1-h6) in document order.
+            - 'links': List of outgoing link targets (href values) in document order.
+            - 'summary': Text of the first paragraph, shortened to SUMMARY_LENGTH characters.
+    """
+    headings = [tag.get_text(" ", strip=True) for tag in soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6"])]
+    links = [tag["href"] for tag in soup.find_all("a", href=True)]
+
+    title = None
+    first_h1 = soup.find("h1")
+    if first_h1 and first_h1.get_text(strip=True):
+        title = first_h1.get_text(" ", strip=True)
+    elif soup.title and soup.title.string:
+        title = soup.title.string.strip()
+    if not title:
+        title = os.path.splitext(os.path.basename(file_path))[0]
+
+    summary = None
+    for paragraph in soup.find_all("p"):
+        text = " ".join(paragraph.get_text(" ", strip=True).split())
+        if text:
+            summary = shorten_text(text, SUMMARY_LENGTH)
+            break
+
+    return {"title": title, "headings": headings, "links": links, "summary": summary}
+
+
+def shorten_text(text, length):
+    """
+    Shorten a text to at most length characters, cutting at a word boundary when possible.
+
+    Args:
+        text (str): The text to shorten.
+        length (int): Maximum length of the result, including the trailing ellipsis.
+
+    Returns:
+        str: The text, or its shortened version ending with an ellipsis.
+    """
+    if len(text) <= length:
+        return text
+    cut = text[:length - 1]
+    if " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut.rstrip(" ,.;:") + "…"
+
+
+def get_fragment_path(file_path):
+    """
+    Get the path of the body-only fragment written next to a generated page.
+
+    Args:
+        file_path (str): Path to the generated HTML file.
+
+    Returns:
+        str: Path of the fragment file (e.g. 'page.frag.html' for 'page.html').
+    """
+    return os.path.splitext(file_path)[0] + FRAGMENT_SUFFIX
+
+
+def get_body_fragment(soup):
+    """
+    Get the contents of a page's <body> as a fragment which the index can load in place.
+
+    Args:
+        soup (BeautifulSoup): The parsed generated page.
+
+    Returns:
+        str: The inner HTML of the body.
+    """
+    body = soup.body if soup.body else soup
+    return "".join(str(child) for child in body.contents).strip() + "\n"
+
+
+def apply_content_mode(content, mode):
+    """
+    Switch index page content between loading documents in an iframe and loading fragments.
+
+    Args:
+        content (str): HTML content of the index page.
+        mode (str): Either 'iframe' or 'fragments'.
+
+    Returns:
+        str: The modified index page content.
+    """
+    content = content.replace('data-content-mode="iframe"', f'data-content-mode="{mode}"')
+    if mode == "fragments":
+        # The first page is fetched as a fragment, so the iframe should not load anything.
+        content = content.replace('<iframe id="contentFrame" src="home.html">', '<iframe id="contentFrame" hidden>')
+    return content
+
+
+def build_placeholder_page(source, reason):
+    """
+    Build the page shown in place of a document which could not be rendered.
+
+    Args:
+        source (str): Source path of the document.
+        reason (str): Why the document could not be rendered.
+
+    Returns:
+        str: The placeholder HTML page.
+    """
+    name = escape(os.path.basename(source))
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{name}</title>
+    <style>
+        body {{
+            font-family: Arial, sans-serif;
+            max-width: 800px;
+            margin: 0 auto;
+            padding: 20px;
+            line-height: 1.6;
+        }}
+        .note {{
+            background: #fff4e5;
+            padding: 10px;
+            border-left: 4px solid #ff9800;
+        }}
+    </style>
+</head>
+<body>
+    <h1>{name}</h1>
+    <div class="note">
+        <p>This document could not be rendered: {escape(reason)}.</p>
+        <p>Source: <code>{escape(source)}</code></p>
+    </div>
+</body>
+</html>
+"""
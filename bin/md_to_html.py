@@ -11,26 +11,49 @@ import markdown
 import sys
 import os
 
-def convert_md_to_html(input_file, output_file):
-    try:
-        # Check if input file exists
-        if not os.path.exists(input_file):
-            output_text(f"Error: Input file '{input_file}' does not exist.", "error")
-            return
-        
-        # Check if input file has .md extension
-        if not input_file.lower().endswith('.md'):
-            output_text("Warning: Input file does not have a .md extension.", "warning")
-        
-        # Read the Markdown file
-        with open(input_file, 'r', encoding='utf-8') as md_file:
-            md_content = md_file.read()
-        
-        # Convert Markdown to HTML
-        html_content = markdown.markdown(md_content, extensions=['extra', 'codehilite', 'toc'])
-        
-        # Create basic HTML template
-        html_template = f"""<!DOCTYPE html>
+# Extensions used to render every Markdown document.
+MARKDOWN_EXTENSIONS = ['extra', 'codehilite', 'toc']
+
+
+def warm_up_md_renderer():
+    """
+    Load the Markdown extensions and the syntax highlighter by rendering a tiny document, so
+    their (lazy) imports aren't charged to the first real document a process renders. The
+    unlabelled code block makes pygments load every lexer to guess its language.
+    """
+    markdown.markdown("# Title\n\n```python\npass\n```\n\n    pass\n", extensions=MARKDOWN_EXTENSIONS)
+
+
+def render_md_to_html(input_file):
+    """
+    Render a Markdown (.md) file to a standalone HTML page.
+
+    Args:
+        input_file (str): Path to the Markdown file.
+
+    Returns:
+        str: The HTML page.
+
+    Raises:
+        FileNotFoundError: If the input file doesn't exist.
+    """
+    # Check if input file exists
+    if not os.path.exists(input_file):
+        raise FileNotFoundError(f"Input file '{input_file}' does not exist.")
+    
+    # Check if input file has .md extension
+    if not input_file.lower().endswith('.md'):
+        output_text("Warning: Input file does not have a .md extension.", "warning")
+    
+    # Read the Markdown file
+    with open(input_file, 'r', encoding='utf-8') as md_file:
+        md_content = md_file.read()
+    
+    # Convert Markdown to HTML
+    html_content = markdown.markdown(md_content, extensions=MARKDOWN_EXTENSIONS)
+    
+    # Create basic HTML template
+    html_template = f"""<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
@@ -61,6 +84,17 @@ def convert_md_to_html(input_file, output_file):
 </body>
 </html>
 """
+    return html_template
+
+
+def convert_md_to_html(input_file, output_file):
+    try:
+        # Check if input file exists
+        if not os.path.exists(input_file):
+            output_text(f"Error: Input file '{input_file}' does not exist.", "error")
+            return
+        
+        html_template = render_md_to_html(input_file)
         
         # Write to output HTML file
         with open(output_file, 'w', encoding='utf-8') as html_file:
@@ -8,18 +8,28 @@ Generates an HTML page that embeds a PDF for in-browser viewing.
 from .griddle_utils import output_text
 import os
 
-def convert_pdf_to_html(pdf_path, output_html):
-    try:
-        if not os.path.exists(pdf_path):
-            output_text(f"Error: PDF file '{pdf_path}' not found.", "error")
-            return
+def render_pdf_to_html(pdf_path):
+    """
+    Render an HTML page which embeds a PDF for in-browser viewing.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+
+    Returns:
+        str: The HTML page.
+
+    Raises:
+        FileNotFoundError: If the PDF file doesn't exist.
+    """
+    if not os.path.exists(pdf_path):
+        raise FileNotFoundError(f"PDF file '{pdf_path}' not found.")
 
-        if not pdf_path.lower().endswith(".pdf"):
-            output_text("Warning: File does not have a .pdf extension.", "warning")
+    if not pdf_path.lower().endswith(".pdf"):
+        output_text("Warning: File does not have a .pdf extension.", "warning")
 
-        pdf_filename = os.path.basename(pdf_path)
+    pdf_filename = os.path.basename(pdf_path)
 
-        html_content = f"""<!DOCTYPE html>
+    html_content = f"""<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
@@ -41,6 +51,16 @@ def convert_pdf_to_html(pdf_path, output_html):
 </body>
 </html>
 """
+    return html_content
+
+
+def convert_pdf_to_html(pdf_path, output_html):
+    try:
+        if not os.path.exists(pdf_path):
+            output_text(f"Error: PDF file '{pdf_path}' not found.", "error")
+            return
+
+        html_content = render_pdf_to_html(pdf_path)
 
         with open(output_html, 'w', encoding='utf-8') as f:
             f.write(html_content)
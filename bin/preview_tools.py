@@ -0,0 +1,118 @@
+#!/bin/python3
+"""
+preview_tools.py
+
+This file contains the tools needed to publish the hover previews of the generated site. The
+summary of every document (title, first paragraph and heading outline) is packed into small
+JSON shards keyed by a document id derived from its output path. The navigation links carry
+the id of their document, so the index can fetch the one shard it needs and show a preview
+card without loading the page itself.
+"""
+
+import hashlib
+import json
+import math
+from .html_tools import shorten_text
+
+# Folder (inside the output folder) holding the preview shards.
+PREVIEW_FOLDER = "_previews"
+
+# Approximate size (in bytes) of a preview shard.
+PREVIEW_SHARD_BYTES = 4096
+
+# Number of headings kept in the outline of a preview, and their maximum length.
+OUTLINE_HEADINGS = 8
+OUTLINE_HEADING_LENGTH = 60
+
+
+def get_document_id(output_path):
+    """
+    Get the id of a document from its output path.
+
+    Args:
+        output_path (str): Path of the generated page relative to the site root.
+
+    Returns:
+        str: Short hex id of the document, stable between builds.
+    """
+    return hashlib.sha1(output_path.replace("\\", "/").encode("utf-8")).hexdigest()[:10]
+
+
+def get_preview_shard(document_id, shard_count):
+    """
+    Get the shard holding the preview of a document. script.js computes it the same way.
+
+    Args:
+        document_id (str): Id of the document, as returned by get_document_id().
+        shard_count (int): Number of preview shards.
+
+    Returns:
+        int: Index of the shard.
+    """
+    return int(document_id[:8], 16) % shard_count
+
+
+def get_preview_entry(document):
+    """
+    Build the compact preview of a document.
+
+    Args:
+        document (dict): Document record with 'title', 'summary' and 'headings' keys.
+
+    Returns:
+        list: [title, summary, outline] where outline is a list of heading texts.
+    """
+    outline = [heading for heading in document["headings"] if heading != document["title"]]
+    outline = [shorten_text(heading, OUTLINE_HEADING_LENGTH) for heading in outline[:OUTLINE_HEADINGS]]
+    return [document["title"], document.get("summary") or "", outline]
+
+
+def build_preview_shards(documents):
+    """
+    Pack the previews of the documents into shards of roughly PREVIEW_SHARD_BYTES each.
+
+    Args:
+        documents (list of dict): Rendered document records with 'output', 'title', 'summary'
+            and 'headings' keys.
+
+    Returns:
+        tuple: (document_ids, shards) where document_ids maps output paths to document ids and
+            shards is the list of JSON encoded shards, indexed by shard number.
+    """
+    entries = {get_document_id(document["output"]): get_preview_entry(document) for document in documents}
+    document_ids = {document["output"]: get_document_id(document["output"]) for document in documents}
+
+    total_bytes = sum(len(json.dumps(entry, ensure_ascii=False)) + 16 for entry in entries.values())
+    shard_count = max(1, math.ceil(total_bytes / PREVIEW_SHARD_BYTES))
+
+    shards = [{} for _ in range(shard_count)]
+    for document_id in sorted(entries):
+        shards[get_preview_shard(document_id, shard_count)][document_id] = entries[document_id]
+    return document_ids, [json.dumps(shard, ensure_ascii=False, separators=(",", ":")) for shard in shards]
+
+
+def get_preview_shard_path(index):
+    """
+    Get the path of a preview shard relative to the site root.
+
+    Args:
+        index (int): Index of the shard.
+
+    Returns:
+        str: Relative path of the shard.
+    """
+    return f"{PREVIEW_FOLDER}/{index}.json"
+
+
+def apply_preview_shards(content, shard_count):
+    """
+    Tell the index page how many preview shards the site has.
+
+    Args:
+        content (str): HTML content of the index page.
+        shard_count (int): Number of preview shards.
+
+    Returns:
+        str: The modified index page content.
+    """
+    return content.replace('data-preview-shards="0"', f'data-preview-shards="{shard_count}"')
@@ -0,0 +1,345 @@
+#!/bin/python3
+"""
+scheduler.py
+
+This file contains the cost model and scheduler used to render documents in parallel. The
+expected render cost of each document comes from the duration recorded in the catalog by
+previous builds, falling back to an estimate based on its size and format. Documents are then
+handed to the workers longest-expected-first, so a few huge documents picked up last can't
+dominate the tail of the build. When time or memory limits are configured, the tasks run on
+guarded workers which are killed (and replaced) when a single task exceeds its limits.
+"""
+
+import heapq
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.connection import wait
+from .griddle_utils import output_text
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Fallback render throughput (bytes per second) by extension when the catalog has no history.
+DEFAULT_BYTES_PER_SECOND = {
+    "md": 200_000,
+    "pdf": 1_000_000_000,
+}
+DEFAULT_EXTENSION_RATE = 200_000
+
+# Fixed per-document overhead (seconds) added to size based estimates.
+DOCUMENT_OVERHEAD = 0.0005
+
+# Failure reasons reported by run_guarded_tasks().
+TIME_LIMIT_EXCEEDED = "time limit exceeded"
+MEMORY_LIMIT_EXCEEDED = "memory limit exceeded"
+WORKER_CRASHED = "worker crashed"
+
+
+def estimate_render_costs(documents, catalog, input_folder):
+    """
+    Estimate how long each document will take to render.
+
+    Documents rendered by a previous build use their recorded duration. Other documents are
+    estimated from their size, using the per-document overhead and per-byte cost fitted to the
+    durations of their format in the catalog (or defaults when there is no history).
+
+    Args:
+        documents (list of dict): Discovered document records with a 'source' key.
+        catalog (DocumentCatalog): Catalog holding the durations of previous builds.
+        input_folder (str): Folder containing the source documents.
+
+    Returns:
+        dict: Estimated render seconds keyed by source path.
+    """
+    history = catalog.get_render_seconds()
+    known = {}
+    sizes = {}
+    samples = {}
+    for document in documents:
+        source = document["source"]
+        sizes[source] = os.path.getsize(os.path.join(input_folder, source))
+        if source in history:
+            known[source] = history[source]
+            samples.setdefault(_extension(source), []).append((sizes[source], known[source]))
+    fits = {ext: _fit_render_cost(ext_samples) for ext, ext_samples in samples.items()}
+
+    costs = {}
+    for document in documents:
+        source = document["source"]
+        if source in known:
+            costs[source] = known[source]
+            continue
+
+        ext = _extension(source)
+        overhead, seconds_per_byte = fits.get(ext) or _default_render_cost(ext)
+        costs[source] = overhead + sizes[source] * seconds_per_byte
+    return costs
+
+
+def _default_render_cost(ext):
+    """
+    Get the (overhead, seconds_per_byte) render cost of a format without history.
+    """
+    return DOCUMENT_OVERHEAD, 1.0 / DEFAULT_BYTES_PER_SECOND.get(ext, DEFAULT_EXTENSION_RATE)
+
+
+def _fit_render_cost(samples):
+    """
+    Fit the fixed overhead and the per-byte cost of rendering a format, so the time of small
+    documents (mostly overhead) doesn't inflate the estimates of large ones.
+
+    Args:
+        samples (list of tuple): (size, seconds) of previously rendered documents.
+
+    Returns:
+        tuple: (overhead, seconds_per_byte), or None if the samples can't be fitted.
+    """
+    n = len(samples)
+    mean_size = sum(size for size, _ in samples) / n
+    mean_seconds = sum(seconds for _, seconds in samples) / n
+    variance = sum((size - mean_size) ** 2 for size, _ in samples)
+    if n >= 2 and variance > 0:
+        # Least squares regression of the seconds against the size.
+        slope = sum((size - mean_size) * (seconds - mean_seconds) for size, seconds in samples) / variance
+        if slope > 0:
+            return max(0.0, mean_seconds - slope * mean_size), slope
+
+    # Not enough spread in the sizes: take the overhead out of the measured time instead.
+    overhead = min(DOCUMENT_OVERHEAD, min(seconds for _, seconds in samples))
+    excess = sum(max(0.0, seconds - overhead) for _, seconds in samples)
+    total_size = sum(size for size, _ in samples)
+    if excess <= 0 or total_size <= 0:
+        return None
+    return overhead, excess / total_size
+
+
+def order_longest_first(documents, costs):
+    """
+    Order documents by decreasing expected render cost.
+
+    Args:
+        documents (list of dict): Document records with a 'source' key.
+        costs (dict): Estimated render seconds keyed by source path.
+
+    Returns:
+        list of dict: The documents, most expensive first (ties ordered by source path).
+    """
+    return sorted(documents, key=lambda document: (-costs[document["source"]], document["source"]))
+
+
+def estimate_makespan(costs, jobs):
+    """
+    Estimate the wall-clock time needed to run tasks in order on a number of workers, each
+    task going to the first worker to become free.
+
+    Args:
+        costs (list of float): Task costs in the order they are scheduled.
+        jobs (int): Number of workers.
+
+    Returns:
+        float: The estimated makespan in seconds.
+    """
+    workers = [0.0] * max(1, jobs)
+    for cost in costs:
+        heapq.heappush(workers, heapq.heappop(workers) + cost)
+    return max(workers)
+
+
+def run_tasks(function, tasks, jobs=1, initializer=None, initargs=()):
+    """
+    Run function(task) for every task, in order, on a pool of worker processes.
+
+    Tasks are submitted in the given order, so idle workers always pick up the next task in
+    that order. With a single job the tasks run in this process.
+
+    Args:
+        function (callable): Picklable function called with each task.
+        tasks (list): The tasks, in scheduling order.
+        jobs (int, optional): Number of worker processes. Defaults to 1.
+        initializer (callable, optional): Called once in each worker process before any task.
+        initargs (tuple, optional): Arguments for the initializer.
+
+    Yields:
+        tuple: (task, result) pairs as the tasks complete.
+    """
+    if jobs <= 1:
+        for task in tasks:
+            yield task, function(task)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=initializer, initargs=initargs) as executor:
+        futures = {executor.submit(function, task): task for task in tasks}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def run_guarded_tasks(function, tasks, jobs=1, time_limit=None, memory_limit=None, initializer=None,
+                      initargs=()):
+    """
+    Run function(task) for every task, in order, on worker processes which enforce per-task
+    time and memory limits.
+
+    A worker whose task runs longer than the time limit is killed and replaced. The memory
+    limit caps how much a worker's address space may grow beyond its size after initialization,
+    so a task which exceeds it fails with a MemoryError (or crashes the worker) instead of
+    exhausting the machine's memory. It is ignored where memory_limit_supported() is False.
+
+    Args:
+        function (callable): Picklable function called with each task.
+        tasks (list): The tasks, in scheduling order.
+        jobs (int, optional): Number of worker processes. Defaults to 1.
+        time_limit (float, optional): Maximum seconds per task, or None for no limit.
+        memory_limit (int, optional): Maximum bytes of extra memory per task, or None for no limit.
+        initializer (callable, optional): Called once in each worker process before any task.
+        initargs (tuple, optional): Arguments for the initializer.
+
+    Yields:
+        tuple: (task, result, failure) as the tasks complete, where failure is None on success
+            or one of TIME_LIMIT_EXCEEDED, MEMORY_LIMIT_EXCEEDED or WORKER_CRASHED.
+    """
+    context = multiprocessing.get_context()
+    pending = deque(tasks)
+
+    def start_worker():
+        parent_conn, child_conn = context.Pipe()
+        process = context.Process(target=_guarded_worker_main, daemon=True,
+                                  args=(child_conn, function, memory_limit, initializer, initargs))
+        process.start()
+        child_conn.close()
+        return {"process": process, "conn": parent_conn, "task": None, "started": None}
+
+    def assign(worker):
+        # The clock starts when the worker picks the task up, not while it is still starting.
+        worker["task"] = pending.popleft() if pending else None
+        worker["started"] = None
+        if worker["task"] is not None:
+            worker["conn"].send(worker["task"])
+
+    def replace(index):
+        workers[index]["process"].kill()
+        workers[index]["process"].join()
+        workers[index]["conn"].close()
+        workers[index] = start_worker()
+
+    workers = [start_worker() for _ in range(max(1, min(jobs, len(pending))))]
+    for worker in workers:
+        assign(worker)
+
+    while any(worker["task"] is not None for worker in workers):
+        busy = [worker for worker in workers if worker["task"] is not None]
+        started = [worker["started"] for worker in busy if worker["started"] is not None]
+        timeout = None
+        if time_limit and started:
+            timeout = max(0.0, min(started) + time_limit - time.monotonic())
+        wait([worker["conn"] for worker in busy] + [worker["process"].sentinel for worker in busy], timeout)
+
+        for index, worker in enumerate(workers):
+            task = worker["task"]
+            if task is None:
+                continue
+
+            if worker["conn"].poll():
+                try:
+                    status, result = worker["conn"].recv()
+                except EOFError:
+                    status, result = WORKER_CRASHED, None
+                if status == "started":
+                    worker["started"] = time.monotonic()
+                    continue
+                if status == "ok":
+                    yield task, result, None
+                    assign(worker)
+                    continue
+                yield task, None, status
+            elif not worker["process"].is_alive():
+                yield task, None, WORKER_CRASHED
+            elif time_limit and worker["started"] is not None and time.monotonic() - worker["started"] > time_limit:
+                yield task, None, TIME_LIMIT_EXCEEDED
+            else:
+                continue
+
+            # The worker failed its task, start from a fresh process for the next one.
+            replace(index)
+            assign(workers[index])
+
+    for worker in workers:
+        try:
+            worker["conn"].send(None)
+        except OSError:
+            pass
+        worker["process"].join(5)
+        if worker["process"].is_alive():
+            worker["process"].kill()
+        worker["conn"].close()
+
+
+def _guarded_worker_main(conn, function, memory_limit, initializer, initargs):
+    """
+    Main loop of a guarded worker: run tasks received on conn until None is received.
+    """
+    if initializer is not None:
+        initializer(*initargs)
+    if memory_limit:
+        _limit_memory(memory_limit)
+
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        conn.send(("started", None))
+        try:
+            result = ("ok", function(task))
+        except MemoryError:
+            result = (MEMORY_LIMIT_EXCEEDED, None)
+        conn.send(result)
+
+
+def memory_limit_supported():
+    """
+    Check whether run_guarded_tasks() can enforce a memory limit on this platform.
+
+    Returns:
+        bool: True if the address space of a worker can be limited relative to its size.
+    """
+    return resource is not None and _current_memory() is not None
+
+
+def _current_memory():
+    """
+    Get the size (in bytes) of the address space of the current process, or None if unknown.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _limit_memory(memory_limit):
+    """
+    Limit the address space of the current process to its current size plus memory_limit bytes.
+    The limit is skipped when the current size is unknown, since an absolute limit below the
+    size of the interpreter would make the worker fail before rendering anything.
+    """
+    current = _current_memory()
+    if resource is None or current is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    limit = current + memory_limit
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    if limit <= current:
+        return
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    except (ValueError, OSError):
+        output_text(f"Unable to limit the memory of worker {os.getpid()}", "warning")
+
+
+def _extension(source):
+    return os.path.splitext(source)[1].lstrip(".").lower()
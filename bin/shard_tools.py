@@ -0,0 +1,176 @@
+#!/bin/python3
+"""
+shard_tools.py
+
+This file contains the tools needed to split a GRIDDLE build across several machines (or
+processes). Documents are assigned to shards using a stable hash of their path so every
+machine agrees on the partition, each shard writes its rendered pages plus a partial
+metadata file, and the merge step combines the partial metadata into the final site.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+from .griddle_utils import output_text, ensure_path_exists, METADATA_FOLDER
+
+PARTIAL_METADATA_PATTERN = re.compile(r"^shard_(\d+)_of_(\d+)\.json$")
+
+
+def parse_shard_spec(spec):
+    """
+    Parse a shard specification of the form 'i/N' (1-based) for use with argparse.
+
+    Args:
+        spec (str): Shard specification, e.g. '2/4'.
+
+    Returns:
+        tuple: (index, count) with 1 <= index <= count.
+
+    Raises:
+        argparse.ArgumentTypeError: If the specification is malformed or out of range.
+    """
+    match = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", spec)
+    if not match:
+        raise argparse.ArgumentTypeError(f"Invalid shard '{spec}', expected the form i/N (e.g. 1/4).")
+
+    index, count = int(match.group(1)), int(match.group(2))
+    if count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"Invalid shard '{spec}', index must be between 1 and N.")
+    return index, count
+
+
+def stable_path_hash(rel_path):
+    """
+    Compute a hash of a relative path which is identical on every machine and Python run.
+
+    Args:
+        rel_path (str): Path relative to the input folder.
+
+    Returns:
+        int: Integer hash of the normalized path.
+    """
+    normalized = os.path.normpath(rel_path).replace("\\", "/")
+    return int(hashlib.sha1(normalized.encode("utf-8")).hexdigest(), 16)
+
+
+def document_in_shard(rel_path, shard):
+    """
+    Determine whether a document belongs to the given shard.
+
+    Args:
+        rel_path (str): Path of the document relative to the input folder.
+        shard (tuple): (index, count) as returned by parse_shard_spec, or None for no sharding.
+
+    Returns:
+        bool: True if the document should be rendered by this shard.
+    """
+    if shard is None:
+        return True
+    index, count = shard
+    return stable_path_hash(rel_path) % count == index - 1
+
+
+def partial_metadata_path(output_folder, shard):
+    """
+    Get the path of the partial metadata file written by a shard.
+
+    Args:
+        output_folder (str): The build output folder.
+        shard (tuple): (index, count) of the shard.
+
+    Returns:
+        str: Path to the shard's partial metadata file.
+    """
+    index, count = shard
+    return os.path.join(output_folder, METADATA_FOLDER, f"shard_{index}_of_{count}.json")
+
+
+def write_partial_metadata(output_folder, shard, documents):
+    """
+    Write the metadata of the documents rendered by a shard.
+
+    Args:
+        output_folder (str): The build output folder.
+        shard (tuple): (index, count) of the shard.
+        documents (list of dict): Document metadata records produced by the build.
+
+    Returns:
+        str: Path of the written metadata file.
+    """
+    metadata_file = partial_metadata_path(output_folder, shard)
+    ensure_path_exists(metadata_file)
+
+    index, count = shard
+    data = {"shard": index, "count": count, "documents": documents}
+
+    # Write to a temporary file first so a concurrent merge never reads a partial file.
+    tmp_file = metadata_file + ".tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    os.replace(tmp_file, metadata_file)
+
+    # Metadata of an earlier build with a different shard count would mix with this one.
+    metadata_dir = os.path.dirname(metadata_file)
+    for name in sorted(os.listdir(metadata_dir)):
+        match = PARTIAL_METADATA_PATTERN.match(name)
+        if match and int(match.group(2)) != count:
+            os.remove(os.path.join(metadata_dir, name))
+            output_text(f"Removed stale shard metadata '{name}'", "note")
+
+    output_text(f"Wrote metadata for {len(documents)} documents to '{metadata_file}'", "success")
+    return metadata_file
+
+
+def load_partial_metadata(output_folder):
+    """
+    Load and combine the partial metadata written by every shard of a build.
+
+    Args:
+        output_folder (str): The build output folder containing the shard metadata files.
+
+    Returns:
+        list of dict: Combined document metadata records, sorted by output path.
+
+    If the folder holds metadata written with different shard counts, only the files of the
+    most recently written count are used.
+
+    Raises:
+        FileNotFoundError: If no shard metadata exists in the output folder.
+    """
+    metadata_dir = os.path.join(output_folder, METADATA_FOLDER)
+    shard_files = []
+    if os.path.isdir(metadata_dir):
+        shard_files = [name for name in sorted(os.listdir(metadata_dir))
+                       if PARTIAL_METADATA_PATTERN.match(name)]
+    if not shard_files:
+        raise FileNotFoundError(f"No shard metadata found in '{metadata_dir}'.")
+
+    counts = {int(PARTIAL_METADATA_PATTERN.match(name).group(2)) for name in shard_files}
+    if len(counts) != 1:
+        newest = max(shard_files, key=lambda name: os.path.getmtime(os.path.join(metadata_dir, name)))
+        count = int(PARTIAL_METADATA_PATTERN.match(newest).group(2))
+        ignored = [name for name in shard_files if int(PARTIAL_METADATA_PATTERN.match(name).group(2)) != count]
+        output_text(f"Shard metadata in '{metadata_dir}' mixes shard counts {sorted(counts)}; using the "
+                    f"newest count ({count}) and ignoring {ignored}", "warning")
+        shard_files = [name for name in shard_files if name not in ignored]
+    else:
+        count = counts.pop()
+
+    documents = {}
+    found = set()
+    for name in shard_files:
+        with open(os.path.join(metadata_dir, name), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        found.add(data["shard"])
+        for document in data["documents"]:
+            if document["output"] in documents:
+                output_text(f"Document '{document['output']}' was produced by more than one shard.", "warning")
+            documents[document["output"]] = document
+
+    missing = sorted(set(range(1, count + 1)) - found)
+    if missing:
+        output_text(f"Missing metadata for shard(s) {missing} of {count}; the merged site will be incomplete.", "warning")
+
+    return [documents[key] for key in sorted(documents)]
@@ -0,0 +1,257 @@
+#!/bin/python3
+"""
+site_writer.py
+
+This file contains the writers used by every build stage to store the generated site. The
+DirectoryWriter writes a normal folder of files, while the PackWriter writes the whole site
+into a single seekable ZIP archive (compressing each entry individually), which avoids
+creating hundreds of thousands of small files and makes publishing a single-file transfer.
+A packed site can be served directly with serve_pack() or extracted with any unzip tool.
+"""
+
+import mimetypes
+import os
+import posixpath
+import shutil
+import zipfile
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import unquote
+from .griddle_utils import output_text, ensure_path_exists
+
+# Extensions which are already compressed and are stored in packs without recompressing.
+COMPRESSED_EXTENSIONS = {
+    "png", "jpg", "jpeg", "gif", "webp", "ico", "pdf", "zip", "gz", "bz2", "xz", "7z",
+    "mp3", "mp4", "webm", "ogg", "woff", "woff2"
+}
+
+
+class DirectoryWriter:
+    """
+    Writes the generated site as files in an output folder.
+
+    Can be used as a context manager, which closes the writer when the block exits.
+    """
+
+    def __init__(self, output_folder):
+        """
+        Args:
+            output_folder (str): The folder to write the site to.
+        """
+        self.output_folder = output_folder
+
+    def path(self, rel_path):
+        """
+        Get the filesystem path of a site file.
+        """
+        return os.path.join(self.output_folder, rel_path)
+
+    def exists(self, rel_path):
+        """
+        Check whether a site file has already been written.
+        """
+        return os.path.exists(self.path(rel_path))
+
+    def write_text(self, rel_path, text):
+        """
+        Write a text (UTF-8) file to the site.
+
+        Args:
+            rel_path (str): Path of the file relative to the site root.
+            text (str): Contents of the file.
+        """
+        file_path = self.path(rel_path)
+        ensure_path_exists(file_path)
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def copy_file(self, src_path, rel_path):
+        """
+        Copy an existing file into the site.
+
+        Args:
+            src_path (str): Path of the file to copy.
+            rel_path (str): Destination path relative to the site root.
+        """
+        file_path = self.path(rel_path)
+        ensure_path_exists(file_path)
+        # Copy to a temporary name first so concurrent shards never see a partial file.
+        tmp_file = f"{file_path}.{os.getpid()}.tmp"
+        shutil.copyfile(src_path, tmp_file)
+        os.replace(tmp_file, file_path)
+
+    def close(self):
+        """
+        Finish writing the site. Nothing to do for a folder.
+        """
+
+    def abort(self):
+        """
+        Stop writing the site after an error. The files already written are kept.
+        """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class PackWriter:
+    """
+    Writes the generated site into a single ZIP pack.
+
+    The pack is written to a temporary file and moved into place by close(), so an existing
+    pack keeps being served until the new one is complete. When used as a context manager, the
+    temporary file is removed instead if the block raises.
+    """
+
+    def __init__(self, pack_path):
+        """
+        Args:
+            pack_path (str): Path of the ZIP pack to create.
+        """
+        ensure_path_exists(pack_path)
+        self.pack_path = pack_path
+        self.tmp_path = f"{pack_path}.{os.getpid()}.tmp"
+        self.pack = zipfile.ZipFile(self.tmp_path, 'w')
+        self.names = set()
+
+    def exists(self, rel_path):
+        """
+        Check whether a site file has already been written.
+        """
+        return _pack_name(rel_path) in self.names
+
+    def write_text(self, rel_path, text):
+        """
+        Write a text (UTF-8) file to the site.
+
+        Args:
+            rel_path (str): Path of the file relative to the site root.
+            text (str): Contents of the file.
+        """
+        name = self._add_name(rel_path)
+        self.pack.writestr(name, text.encode('utf-8'), compress_type=_compression(name))
+
+    def copy_file(self, src_path, rel_path):
+        """
+        Copy an existing file into the site.
+
+        Args:
+            src_path (str): Path of the file to copy.
+            rel_path (str): Destination path relative to the site root.
+        """
+        name = self._add_name(rel_path)
+        self.pack.write(src_path, name, compress_type=_compression(name))
+
+    def close(self):
+        """
+        Finish the pack and move it into place.
+        """
+        self.pack.close()
+        os.replace(self.tmp_path, self.pack_path)
+        output_text(f"Wrote {len(self.names)} files to '{self.pack_path}'", "success")
+
+    def abort(self):
+        """
+        Discard the unfinished pack, leaving any existing pack in place.
+        """
+        self.pack.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _add_name(self, rel_path):
+        name = _pack_name(rel_path)
+        if name in self.names:
+            raise FileExistsError(f"'{name}' was already written to '{self.pack_path}'.")
+        self.names.add(name)
+        return name
+
+
+def open_site_writer(output_folder, pack_path=None):
+    """
+    Create the writer for a build.
+
+    Args:
+        output_folder (str): The build output folder.
+        pack_path (str, optional): Path of a ZIP pack to write the site into instead of the folder.
+
+    Returns:
+        DirectoryWriter or PackWriter: The site writer.
+    """
+    if pack_path:
+        return PackWriter(pack_path)
+    return DirectoryWriter(output_folder)
+
+
+def serve_pack(pack_path, port=8000, host="127.0.0.1"):
+    """
+    Serve a packed site over HTTP without extracting it.
+
+    Requests are handled on separate threads, so a slow client doesn't hold up the parallel
+    fragment and preview fetches of the index. Reading entries from a shared ZipFile is safe
+    across threads.
+
+    Args:
+        pack_path (str): Path of the ZIP pack.
+        port (int, optional): Port to listen on. Defaults to 8000.
+        host (str, optional): Address to listen on. Defaults to '127.0.0.1' (this machine only).
+    """
+    pack = zipfile.ZipFile(pack_path, 'r')
+    names = set(pack.namelist())
+
+    class PackRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_entry(include_body=True)
+
+        def do_HEAD(self):
+            self.send_entry(include_body=False)
+
+        def send_entry(self, include_body):
+            path = posixpath.normpath(unquote(self.path.split('?', 1)[0].split('#', 1)[0])).lstrip('/')
+            path = "" if path == "." else path
+            if path == "" or path + "/index.html" in names:
+                path = posixpath.join(path, "index.html")
+
+            if path not in names:
+                self.send_error(404, f"'{path}' is not in the pack")
+                return
+
+            data = pack.read(path) if include_body else None
+            self.send_response(200)
+            self.send_header("Content-Type", mimetypes.guess_type(path)[0] or "application/octet-stream")
+            self.send_header("Content-Length", str(pack.getinfo(path).file_size))
+            self.end_headers()
+            if include_body:
+                self.wfile.write(data)
+
+    server = ThreadingHTTPServer((host, port), PackRequestHandler)
+    output_text(f"Serving '{pack_path}' on http://{host or '0.0.0.0'}:{port}/ (Ctrl+C to stop)", "note")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pack.close()
+
+
+def _pack_name(rel_path):
+    return posixpath.normpath(rel_path.replace("\\", "/")).lstrip("/")
+
+
+def _compression(name):
+    ext = posixpath.splitext(name)[1].lstrip(".").lower()
+    return zipfile.ZIP_STORED if ext in COMPRESSED_EXTENSIONS else zipfile.ZIP_DEFLATED
@@ -10,11 +10,21 @@ Description: A system designed to unify and streamline documentation across mult
 import argparse
 import sys
 import os
+import sqlite3
+import time
 from bin.griddle_utils import *
 from bin.md_to_html import * 
 from bin.pdf_to_html import * 
 from bin.generate_nav import *
 from bin.html_tools import *
+from bs4 import BeautifulSoup
+from bin.shard_tools import *
+from bin.catalog import *
+from bin.highlight_cache import *
+from bin.asset_tools import *
+from bin.site_writer import *
+from bin.scheduler import *
+from bin.preview_tools import *
 
 def parse_arguments() -> argparse.Namespace:
     """
@@ -23,6 +33,15 @@ def parse_arguments() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="GRIDDLE: Process document files in a specified folder."
     )
+    parser.add_argument(
+        'command',
+        nargs='?',
+        default='build',
+        choices=['build', 'merge', 'serve'],
+        help="'build' (default) renders documents from the input folder. 'merge' combines the "
+             "partial metadata written by sharded builds into the output folder's nav and index "
+             "pages without re-rendering anything. 'serve' serves a site pack (see --pack) over HTTP."
+    )
     parser.add_argument(
         '-v', '--verbose',
         action='store_true',
@@ -35,17 +54,430 @@ def parse_arguments() -> argparse.Namespace:
     )
     parser.add_argument(
         '-i', '--input',
-        required=True,
         type=str,
-        help='Input folder containing document files.'
+        help='Input folder containing document files (required for build).'
     )
     parser.add_argument(
         '-o', '--output',
-        required=True,
         type=str,
-        help='Output folder for processed files.'
+        help='Output folder for processed files (required for build and merge).'
+    )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=1,
+        help='Number of worker processes used to render documents. Documents are scheduled '
+             'longest-expected-first using the render times recorded by previous builds. Defaults to 1.'
+    )
+    parser.add_argument(
+        '--time-limit',
+        type=float,
+        metavar='SECONDS',
+        help='Kill the rendering of a single document after this many seconds, recording it as '
+             'failed with a placeholder page.'
+    )
+    parser.add_argument(
+        '--memory-limit',
+        type=int,
+        metavar='MB',
+        help='Maximum memory (in MB) the rendering of a single document may use before it is '
+             'recorded as failed with a placeholder page.'
+    )
+    parser.add_argument(
+        '--quarantine',
+        action='store_true',
+        help='Skip documents which exceeded the time or memory limit in a previous build until '
+             'their content changes.'
     )
-    return parser.parse_args()
+    parser.add_argument(
+        '--shard',
+        type=parse_shard_spec,
+        metavar='i/N',
+        help='Only render the documents belonging to shard i of N (1-based) and write partial '
+             'metadata for a later merge instead of the nav and index pages.'
+    )
+    parser.add_argument(
+        '--fragments',
+        action='store_true',
+        help='Also write body-only fragments of every page and make the index swap them into '
+             'the content area (with prefetching and history support) instead of using an iframe.'
+    )
+    parser.add_argument(
+        '--pack',
+        type=str,
+        help='Write the site into this single ZIP file instead of the output folder (which still '
+             'holds the build catalog and caches). The pack can be served with the serve command '
+             'or extracted with any unzip tool.'
+    )
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=8000,
+        help='Port used by the serve command. Defaults to 8000.'
+    )
+    parser.add_argument(
+        '--host',
+        default='127.0.0.1',
+        help="Address the serve command listens on. Defaults to '127.0.0.1'; use '0.0.0.0' to "
+             "serve on every interface."
+    )
+    parser.add_argument(
+        '--catalog',
+        type=str,
+        help='Path of the SQLite document catalog. Defaults to .griddle/catalog.db in the output '
+             'folder. Sharded builds use a per-shard catalog next to it (e.g. catalog_shard_1_of_2.db).'
+    )
+    args = parser.parse_args()
+
+    if args.command == 'build' and not args.input:
+        parser.error("the following arguments are required for build: -i/--input")
+    if args.command in ('build', 'merge') and not args.output:
+        parser.error(f"the following arguments are required for {args.command}: -o/--output")
+    if args.command == 'serve' and not args.pack:
+        parser.error("the following arguments are required for serve: --pack")
+    if args.command == 'merge' and args.shard:
+        parser.error("--shard cannot be used with merge")
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if (args.time_limit is not None and args.time_limit <= 0) or (args.memory_limit is not None and args.memory_limit <= 0):
+        parser.error("--time-limit and --memory-limit must be positive")
+    if args.pack and (args.shard or args.command == 'merge'):
+        parser.error("--pack cannot be used with sharded builds or merge")
+    return args
+
+
+def get_document_converter(ext):
+    """
+    Get the conversion function for a document extension.
+
+    Args:
+        ext (str): File extension without the leading dot.
+
+    Returns:
+        function: Renderer taking the input file and returning the HTML page, or None if the
+            extension is not converted.
+    """
+    if "md" in ext:
+        return render_md_to_html
+    elif "pdf" in ext:
+        return render_pdf_to_html
+    #elif "adoc" in ext:
+    #    return render_adoc_to_html
+    #elif "asciidoc" in ext:
+    #    return render_asciidoc_to_html
+    return None
+
+
+def process_document(file_path, output_path, asset_store, input_folder, fragments=False):
+    """
+    Render a single document and prepare everything written for it.
+
+    Args:
+        file_path (str): Path of the source document.
+        output_path (str): Path of the generated page relative to the site root.
+        asset_store (AssetStore): Store used to point asset references at their blobs.
+        input_folder (str): The build input folder, which referenced assets must be inside of.
+        fragments (bool, optional): Also prepare a body-only fragment of the page.
+
+    Returns:
+        dict: Result containing 'html' (None if the conversion failed), 'fragment', 'assets'
+            ((asset_path, blob) pairs to store), 'render_seconds', 'title', 'headings', 'links',
+            'summary' and 'error' (why the conversion failed).
+    """
+    ext = os.path.splitext(file_path)[1].lstrip('.')
+    start = time.perf_counter()
+    result = {"html": None, "fragment": None, "assets": [], "title": None, "headings": [], "links": [],
+              "summary": None, "error": None}
+    try:
+        html = get_document_converter(ext)(file_path)
+        soup = BeautifulSoup(html, "html.parser")
+        result["assets"] = asset_store.rewrite(soup, file_path, output_path, input_folder)
+        result["html"] = str(soup) if result["assets"] else html
+        if fragments:
+            result["fragment"] = get_body_fragment(soup)
+        result.update(extract_html_metadata(soup, output_path))
+    except MemoryError:
+        output_text(f"Converting '{file_path}' ran out of memory", "error")
+        result["html"] = None
+        result["error"] = MEMORY_LIMIT_EXCEEDED
+    except Exception as e:
+        output_text(f"An error occurred converting '{file_path}': {str(e)}", "error")
+        result["html"] = None
+        result["error"] = str(e)
+    result["render_seconds"] = time.perf_counter() - start
+    return result
+
+
+# State of a render worker process, set up by init_render_worker().
+worker_asset_store = None
+
+
+def init_render_worker(highlight_cache_path, catalog_path, warm_up=False):
+    """
+    Initialize a render worker process with its own connections to the highlight cache and catalog.
+
+    Args:
+        highlight_cache_path (str): Path of the highlight cache database.
+        catalog_path (str): Path of the document catalog, used for the asset hashes.
+        warm_up (bool, optional): Load the renderer's extensions and lexers up front, so the
+            first document doesn't pay for them. Used by guarded workers, which time each document.
+    """
+    global worker_asset_store
+    if warm_up:
+        warm_up_md_renderer()
+    install_highlight_cache(HighlightCache(highlight_cache_path))
+    worker_asset_store = AssetStore(None, DocumentCatalog(catalog_path))
+
+
+def process_document_in_worker(task):
+    """
+    Process a single document in a worker process.
+
+    Args:
+        task (tuple): (file_path, output_path, input_folder, fragments) as passed to process_document().
+
+    Returns:
+        dict: The process_document() result plus the 'highlight_stats' of the document, to be
+            added to the build summary, and the 'worker' (process id) which rendered it.
+    """
+    file_path, output_path, input_folder, fragments = task
+    result = process_document(file_path, output_path, worker_asset_store, input_folder, fragments)
+    cache = CachedCodeHilite.cache
+    try:
+        worker_asset_store.catalog.flush()
+        cache.flush()
+    except sqlite3.Error as e:
+        # Report it as an error of the document rather than letting it kill the worker.
+        output_text(f"An error occurred saving the caches for '{file_path}': {str(e)}", "error")
+        result["html"] = None
+        result["error"] = str(e)
+    result["highlight_stats"] = cache.take_stats()
+    result["worker"] = os.getpid()
+    return result
+
+
+def discover_documents(input_folder, output_folder, shard=None):
+    """
+    Find the documents to build in the input folder.
+
+    Args:
+        input_folder (str): Folder containing the source documents.
+        output_folder (str): Folder the generated HTML files are written to.
+        shard (tuple, optional): (index, count) to only discover one shard of the documents.
+
+    Returns:
+        list of dict: Records containing 'source' (relative to the input folder), 'repo',
+            'hash' and 'output' (relative to the output folder).
+    """
+    documents = []
+    outputs = {}
+    for root, dirs, files in os.walk(input_folder):
+        dirs.sort()
+        repo_root = find_repo_root(root)
+        for filename in sorted(files):
+            ext = os.path.splitext(filename)[1].lstrip('.')
+            if get_document_converter(ext) is None:
+                continue
+
+            file_path = os.path.join(root, filename)
+            rel_source = os.path.relpath(file_path, input_folder).replace("\\", "/")
+            new_file = output_folder + "/" + replace_extension(file_path, "html")
+            output = os.path.relpath(new_file, output_folder).replace("\\", "/")
+
+            # Documents sharing a name (e.g. 'a.md' and 'a.pdf') would write the same page, keep
+            # the first one. This is checked before sharding so every shard keeps the same one.
+            if output in outputs:
+                if document_in_shard(rel_source, shard):
+                    output_text(f"Skipping '{rel_source}': '{outputs[output]}' is already built to "
+                                f"'{output}'", "warning")
+                continue
+            outputs[output] = rel_source
+            if not document_in_shard(rel_source, shard):
+                continue
+
+            documents.append({
+                "source": rel_source,
+                "repo": os.path.basename(repo_root) if repo_root else None,
+                "hash": hash_file(file_path),
+                "output": output
+            })
+    return documents
+
+
+def build_documents(input_folder, output_folder, writer, catalog, build_id, asset_store,
+                    highlight_cache, shard=None, fragments=False, jobs=1, time_limit=None,
+                    memory_limit=None, quarantine=False):
+    """
+    Convert the documents in the input folder to HTML files written through the site writer,
+    recording them in the catalog.
+
+    Args:
+        input_folder (str): Folder containing the source documents.
+        output_folder (str): The build output folder.
+        writer (DirectoryWriter or PackWriter): Writer of the generated site.
+        catalog (DocumentCatalog): Catalog to record the documents in.
+        build_id (int): The id of the current build in the catalog.
+        asset_store (AssetStore): Store to publish the assets referenced by the documents to.
+        highlight_cache (HighlightCache): Highlight cache of the build, which collects the
+            cache statistics of the worker processes.
+        shard (tuple, optional): (index, count) to only render one shard of the documents.
+        fragments (bool, optional): Also write a body-only fragment of every page.
+        jobs (int, optional): Number of worker processes used to render documents.
+        time_limit (float, optional): Seconds after which the rendering of a document is killed.
+        memory_limit (int, optional): Bytes of memory the rendering of a document may use.
+        quarantine (bool, optional): Skip documents which exceeded a limit in a previous build
+            until their content changes.
+
+    Returns:
+        list of dict: Document records containing 'source', 'repo', 'hash', 'output',
+            'status', 'render_seconds', 'title', 'headings', 'links', 'summary' and 'error'.
+    """
+    documents = discover_documents(input_folder, output_folder, shard)
+
+    # Quarantined documents get their placeholder page again unless their content changed.
+    quarantined = catalog.get_quarantined() if quarantine else {}
+    skipped = [document for document in documents if quarantined.get(document["source"]) == document["hash"]]
+    for document in skipped:
+        document.update({"status": "quarantined", "render_seconds": None, "title": None, "headings": [],
+                         "links": [], "summary": None, "error": "quarantined after exceeding a limit in a previous build"})
+        writer.write_text(document["output"], build_placeholder_page(document["source"], document["error"]))
+        output_text(f"Skipping quarantined document '{document['source']}'", "warning")
+
+    # Schedule the documents expected to take longest first so they don't end up in the tail.
+    # The costs are estimated before the documents are marked as pending in the catalog.
+    costs = estimate_render_costs(documents, catalog, input_folder)
+    catalog.record_discovered(documents, build_id)
+    skipped_sources = {document["source"] for document in skipped}
+    ordered = order_longest_first([document for document in documents if document["source"] not in skipped_sources],
+                                  costs)
+    ordered_costs = [costs[document["source"]] for document in ordered]
+    estimated = estimate_makespan(ordered_costs, jobs)
+
+    by_path = {os.path.join(input_folder, document["source"]): document for document in ordered}
+    tasks = [(file_path, document["output"], input_folder, fragments) for file_path, document in by_path.items()]
+    worker_args = (default_highlight_cache_path(output_folder), catalog.db_path)
+    if time_limit or memory_limit:
+        results = run_guarded_tasks(process_document_in_worker, tasks, jobs, time_limit, memory_limit,
+                                    init_render_worker, worker_args + (True,))
+    elif jobs > 1:
+        results = ((task, result, None) for task, result in
+                   run_tasks(process_document_in_worker, tasks, jobs, init_render_worker, worker_args))
+    else:
+        results = ((task, process_document(task[0], task[1], asset_store, input_folder, fragments), None) for task in tasks)
+
+    # The wall time includes starting the workers and writing the pages, so the estimate is
+    # compared to the busiest worker's render time instead.
+    start = time.perf_counter()
+    worker_seconds = {}
+    for task, result, failure in results:
+        file_path = task[0]
+        document = by_path[file_path]
+        if failure is not None:
+            # The worker was killed or crashed, record the document as failed.
+            output_text(f"Rendering '{file_path}' failed: {failure}", "error")
+            result = {"html": None, "title": None, "headings": [], "links": [], "summary": None, "error": failure,
+                      "render_seconds": time_limit if failure == TIME_LIMIT_EXCEEDED else None}
+        elif result["error"] == MEMORY_LIMIT_EXCEEDED:
+            failure = result["error"]
+
+        document["render_seconds"] = result["render_seconds"]
+        worker = result.get("worker")
+        worker_seconds[worker] = worker_seconds.get(worker, 0.0) + (result["render_seconds"] or 0.0)
+        document.update({key: result[key] for key in ("title", "headings", "links", "summary", "error")})
+        if result.get("highlight_stats"):
+            highlight_cache.add_stats(result["highlight_stats"])
+
+        if result["html"] is None:
+            # Only documents which exceeded a limit are quarantined, not ones whose worker crashed.
+            exceeded = failure in (TIME_LIMIT_EXCEEDED, MEMORY_LIMIT_EXCEEDED)
+            document["status"] = "quarantined" if quarantine and exceeded else "failed"
+            writer.write_text(document["output"], build_placeholder_page(document["source"], document["error"]))
+        else:
+            for asset_path, blob in result["assets"]:
+                asset_store.store(asset_path, blob)
+            writer.write_text(document["output"], result["html"])
+            if result["fragment"] is not None:
+                writer.write_text(get_fragment_path(document["output"]), result["fragment"])
+            document["status"] = "ok"
+            output_text(f"Successfully converted '{file_path}' to '{document['output']}'", "success")
+
+        catalog.record_rendered(document["source"], document["status"], document["render_seconds"],
+                                document["title"], document["headings"], document["links"], document["error"],
+                                document["summary"])
+
+    for document in skipped:
+        catalog.record_rendered(document["source"], document["status"], error=document["error"])
+    catalog.flush()
+    output_text(f"Schedule: {len(ordered)} documents on {jobs} worker(s), estimated render makespan "
+                f"{estimated:.2f}s ({sum(ordered_costs):.2f}s of work), actual render makespan "
+                f"{max(worker_seconds.values(), default=0.0):.2f}s, wall time {time.perf_counter() - start:.2f}s "
+                f"(including worker start-up and page writes)", "note")
+    return documents
+
+
+def finalize_site(writer, catalog, fragments=False, template_folder="templates"):
+    """
+    Generate the navigation and hover previews and write the template files for the documents
+    in the catalog.
+
+    Args:
+        writer (DirectoryWriter or PackWriter): Writer of the generated site.
+        catalog (DocumentCatalog): Catalog of the documents in the site.
+        fragments (bool, optional): Make the index load page fragments instead of using an iframe.
+        template_folder (str, optional): Folder containing the template files. Defaults to 'templates'.
+    """
+    # Pack the previews shown when hovering over links to the rendered documents.
+    document_ids, preview_shards = build_preview_shards(catalog.get_documents())
+    for index, shard in enumerate(preview_shards):
+        writer.write_text(get_preview_shard_path(index), shard)
+
+    # Generate the navigation for the generated html files.
+    navigation = get_nav_block_from_list(catalog.output_paths(), document_ids)
+    
+    # Setup the template files, filling in the index page before it is written.
+    for root, dirs, files in os.walk(template_folder):
+        for filename in files:
+            src = os.path.join(root, filename)
+            rel_path = os.path.relpath(src, template_folder).replace("\\", "/")
+            if rel_path == "index.html":
+                with open(src, 'r', encoding='utf-8') as f:
+                    content = f.read()
+                content = insert_autogen_nav_section(content, navigation)
+                content = apply_content_mode(content, "fragments" if fragments else "iframe")
+                content = apply_preview_shards(content, len(preview_shards))
+                writer.write_text(rel_path, content)
+            else:
+                writer.copy_file(src, rel_path)
+    output_text(f"Wrote the template files from '{template_folder}'", "success")
+
+
+def print_build_summary(catalog, build_id, documents, removed, elapsed, verbose=False):
+    """
+    Print a summary of a finished build.
+
+    Args:
+        catalog (DocumentCatalog): Catalog of the build.
+        build_id (int): The id of the build in the catalog.
+        documents (list of dict): Document records of the build.
+        removed (list of str): Source paths of documents removed since the previous build.
+        elapsed (float): Wall-clock duration of the build in seconds.
+        verbose (bool, optional): Also list the changed and slowest documents.
+    """
+    changed = catalog.changed_documents(build_id)
+    failed = [document for document in documents if document["status"] == "failed"]
+    quarantined = [document for document in documents if document["status"] == "quarantined"]
+
+    output_text(f"Built {len(documents)} documents in {elapsed:.2f}s "
+                f"({len(changed)} new or changed, {len(removed)} removed, {len(failed)} failed, "
+                f"{len(quarantined)} quarantined)", "success")
+    for document in failed + quarantined:
+        output_text(f"Failed to build '{document['source']}': {document['error']}", "warning")
+
+    if verbose:
+        for source in changed:
+            output_text(f"Changed: {source}", "note")
+        for source, seconds in catalog.slowest_documents(5):
+            output_text(f"Slowest: {source} ({seconds:.3f}s)", "note")
 
 
 def main():
@@ -55,37 +487,72 @@ def main():
     args = parse_arguments()
     
     # Print parsed arguments for demonstration
+    output_text(f"Command: {args.command}", "note")
     output_text(f"Verbose mode: {args.verbose}", "note")
     output_text(f"Debug mode: {args.debug}", "note")
     output_text(f"Input folder: {args.input}", "note")
     output_text(f"Output folder: {args.output}", "note")
+    if args.pack:
+        output_text(f"Site pack: {args.pack}", "note")
+
+    if args.command == 'serve':
+        serve_pack(args.pack, args.port, args.host)
+        return
+
+    if args.catalog:
+        catalog = DocumentCatalog(shard_catalog_path(args.catalog, args.shard))
+    else:
+        catalog = DocumentCatalog(default_catalog_path(args.output, args.shard))
+    build_id = catalog.begin_build()
+
+    if args.command == 'merge':
+        # Combine the metadata of all shards without re-rendering anything.
+        try:
+            documents = load_partial_metadata(args.output)
+        except FileNotFoundError as e:
+            output_text(str(e), "error")
+            catalog.close()
+            sys.exit(1)
+        catalog.upsert_documents(documents, build_id)
+        catalog.prune(build_id)
+        with open_site_writer(args.output) as writer:
+            finalize_site(writer, catalog, args.fragments)
+        catalog.close()
+        output_text(f"Merged {len(documents)} documents into '{args.output}'", "success")
+        return
+
+    if args.shard:
+        output_text(f"Shard: {args.shard[0]}/{args.shard[1]}", "note")
+
+    if args.memory_limit and not memory_limit_supported():
+        output_text("--memory-limit can't be enforced on this platform and is ignored", "warning")
+        args.memory_limit = None
+
+    # Cache highlighted code blocks across documents and builds.
+    highlight_cache = HighlightCache(default_highlight_cache_path(args.output))
+    install_highlight_cache(highlight_cache)
 
     # Generate output folder with created or compiled html files.
-    for root, dirs, files in os.walk(args.input):
-        for filename in files:
-            file_path = os.path.join(root, filename)
-            full_path = os.path.abspath(file_path)
-            name_no_ext = os.path.splitext(filename)[0]
-            ext = os.path.splitext(filename)[1].lstrip('.')
-            new_file = args.output + "/" + replace_extension(file_path, "html")
-            ensure_path_exists(new_file)
-            
-            if "md" in ext:
-                convert_md_to_html(file_path, new_file)
-            elif "pdf" in ext:
-                convert_pdf_to_html(file_path, new_file)
-            #elif "adoc" in ext:
-            #    convert_adoc_to_html(file_path, new_file)
-            #elif "asciidoc" in ext:
-            #    convert_asciidoc_to_html(file_path, new_file)
-    
-    # Generate the navigation for the newly generated html files.
-    navigation = get_full_html_nav_block(args.output)
-    
-    # Setup the template files.
-    copy_folder_contents("templates", f"{args.output}")
-    replace_autogen_nav_section(f"{args.output}/index.html", navigation)
-    
+    start = time.perf_counter()
+    with open_site_writer(args.output, args.pack) as writer:
+        asset_store = AssetStore(writer, catalog)
+        documents = build_documents(args.input, args.output, writer, catalog, build_id, asset_store,
+                                    highlight_cache, args.shard, args.fragments, args.jobs, args.time_limit,
+                                    args.memory_limit * 1024 * 1024 if args.memory_limit else None,
+                                    args.quarantine)
+        highlight_cache.close()
+        removed = catalog.prune(build_id)
+
+        if args.shard:
+            # The nav and index pages are generated once all shards are merged.
+            write_partial_metadata(args.output, args.shard, documents)
+        else:
+            finalize_site(writer, catalog, args.fragments)
+
+    print_build_summary(catalog, build_id, documents, removed, time.perf_counter() - start, args.verbose)
+    output_text(highlight_cache.summary(), "note")
+    output_text(asset_store.summary(), "note")
+    catalog.close()
     
 
 if __name__ == "__main__":
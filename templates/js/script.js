@@ -1,16 +1,334 @@
 const links = document.querySelectorAll('.navbar a');
 const iframe = document.getElementById('contentFrame');
+const fragmentArea = document.getElementById('contentFragment');
+const previewCard = document.getElementById('previewCard');
+
+// 'iframe' loads every page in the iframe, 'fragments' swaps body-only page fragments
+// into the content area (see the --fragments build option).
+const contentMode = document.body.dataset.contentMode || 'iframe';
+const FRAGMENT_SUFFIX = '.frag.html';
+const FRAGMENT_CACHE_SIZE = 20;
+const fragmentCache = new Map();
+let currentUrl = null;
+
+const siteRoot = new URL('.', document.baseURI).href;
+const navUrls = new Set(Array.from(links, l => l.dataset.url));
+
+// Hover previews are packed into JSON shards keyed by document id (see bin/preview_tools.py).
+const PREVIEW_FOLDER = '_previews';
+const PREVIEW_DELAY = 300;
+const previewShardCount = parseInt(document.body.dataset.previewShards || '0', 10);
+const previewShards = new Map();
+const docIds = new Map();
+links.forEach(l => {
+    if (l.dataset.docId) {
+        docIds.set(l.dataset.url, l.dataset.docId);
+    }
+});
+let previewTimer = null;
+let previewLink = null;
+
+function setActiveLink(url) {
+    links.forEach(l => {
+        const active = l.dataset.url === url;
+        l.classList.toggle('active', active);
+        if (active) {
+            // Expand the folders containing the link, e.g. when opened from a deep link.
+            let parent = l.parentElement.closest('li');
+            while (parent) {
+                parent = parent.parentElement.closest('li');
+                if (parent) {
+                    parent.classList.add('expanded');
+                }
+            }
+        }
+    });
+}
+
+function extractBody(html) {
+    return new DOMParser().parseFromString(html, 'text/html').body.innerHTML;
+}
+
+// Fetch the fragment of a page, falling back to the full page when there is no fragment
+// (e.g. home.html). Fragments are kept in a small least-recently-used cache.
+function fetchFragment(url) {
+    if (fragmentCache.has(url)) {
+        const cached = fragmentCache.get(url);
+        fragmentCache.delete(url);
+        fragmentCache.set(url, cached);
+        return cached;
+    }
+
+    const fragmentUrl = url.replace(/\.html$/, FRAGMENT_SUFFIX);
+    const request = fetch(fragmentUrl)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(`Failed to load ${fragmentUrl}`);
+            }
+            return response.text();
+        })
+        .catch(() => fetch(url).then(response => {
+            if (!response.ok) {
+                throw new Error(`Failed to load ${url}`);
+            }
+            return response.text().then(extractBody);
+        }));
+    request.catch(() => fragmentCache.delete(url));
+
+    fragmentCache.set(url, request);
+    while (fragmentCache.size > FRAGMENT_CACHE_SIZE) {
+        fragmentCache.delete(fragmentCache.keys().next().value);
+    }
+    return request;
+}
+
+function prefetch(url) {
+    if (contentMode === 'fragments' && url) {
+        fetchFragment(url).catch(() => {});
+    }
+}
+
+// Fragments reference assets and pages relative to their own location, so resolve
+// those references against the page url before inserting them into the index.
+function showFragment(url, html) {
+    const template = document.createElement('template');
+    template.innerHTML = html;
+    const base = new URL(url, document.baseURI);
+    template.content.querySelectorAll('[src], [href], [data]').forEach(element => {
+        ['src', 'href', 'data'].forEach(attribute => {
+            const value = element.getAttribute(attribute);
+            if (value && !value.startsWith('#')) {
+                element.setAttribute(attribute, new URL(value, base).href);
+            }
+        });
+    });
+    fragmentArea.replaceChildren(template.content);
+    fragmentArea.scrollTop = 0;
+}
+
+// Fetch the preview shard holding a document, once per shard.
+function fetchPreviewShard(docId) {
+    const shard = parseInt(docId.slice(0, 8), 16) % previewShardCount;
+    if (!previewShards.has(shard)) {
+        const shardUrl = `${PREVIEW_FOLDER}/${shard}.json`;
+        const request = fetch(shardUrl).then(response => {
+            if (!response.ok) {
+                throw new Error(`Failed to load ${shardUrl}`);
+            }
+            return response.json();
+        });
+        request.catch(() => previewShards.delete(shard));
+        previewShards.set(shard, request);
+    }
+    return previewShards.get(shard);
+}
+
+function renderPreview([title, summary, outline]) {
+    const heading = document.createElement('strong');
+    heading.textContent = title;
+    const children = [heading];
+    if (summary) {
+        const paragraph = document.createElement('p');
+        paragraph.textContent = summary;
+        children.push(paragraph);
+    }
+    if (outline.length) {
+        const list = document.createElement('ul');
+        outline.forEach(text => {
+            const item = document.createElement('li');
+            item.textContent = text;
+            list.appendChild(item);
+        });
+        children.push(list);
+    }
+    previewCard.replaceChildren(...children);
+}
+
+// Place the card to the right of the link if it fits, otherwise below it.
+function positionPreview(rect) {
+    const margin = 8;
+    previewCard.hidden = false;
+    let left = rect.right + margin;
+    let top = rect.top;
+    if (left + previewCard.offsetWidth > window.innerWidth - margin) {
+        left = rect.left;
+        top = rect.bottom + margin;
+    }
+    left = Math.min(left, window.innerWidth - previewCard.offsetWidth - margin);
+    top = Math.min(top, window.innerHeight - previewCard.offsetHeight - margin);
+    previewCard.style.left = Math.max(margin, left) + 'px';
+    previewCard.style.top = Math.max(margin, top) + 'px';
+}
+
+// Show the preview of a page after a short delay, so moving the mouse across links doesn't
+// fetch every shard. getRect returns the position of the link in the index.
+function schedulePreview(link, url, getRect) {
+    const docId = docIds.get(url);
+    if (link === previewLink || !docId || !previewShardCount) {
+        return;
+    }
+    hidePreview();
+    previewLink = link;
+    previewTimer = setTimeout(() => {
+        fetchPreviewShard(docId)
+            .then(shard => {
+                if (previewLink === link && shard[docId]) {
+                    renderPreview(shard[docId]);
+                    positionPreview(getRect());
+                }
+            })
+            .catch(() => {});
+    }, PREVIEW_DELAY);
+}
+
+function hidePreview() {
+    clearTimeout(previewTimer);
+    previewLink = null;
+    previewCard.hidden = true;
+}
+
+// Get the page a link in a document points to, relative to the site root. Links to source
+// documents (e.g. 'other.md') are mapped to the page generated from them.
+function pageOfLink(link) {
+    if (link.getAttribute('href').startsWith('#') || !link.href.startsWith(siteRoot)) {
+        return null;
+    }
+    const page = decodeURIComponent(link.href.slice(siteRoot.length).split(/[?#]/)[0]);
+    return page.replace(/\.(md|adoc|asciidoc|pdf)$/i, '.html');
+}
+
+// Show previews for the cross-links of a document shown in the index. Links inside the
+// iframe are positioned relative to it, so their position is offset by the frame's.
+function watchLinkPreviews(root, frame = null) {
+    root.addEventListener('mouseover', e => {
+        const link = e.target.closest('a[href]');
+        const page = link && pageOfLink(link);
+        if (!page) {
+            return;
+        }
+        schedulePreview(link, page, () => {
+            const rect = link.getBoundingClientRect();
+            if (!frame) {
+                return rect;
+            }
+            const offset = frame.getBoundingClientRect();
+            return new DOMRect(rect.left + offset.left, rect.top + offset.top, rect.width, rect.height);
+        });
+    });
+    root.addEventListener('mouseout', e => {
+        const link = e.target.closest('a[href]');
+        if (link && !link.contains(e.relatedTarget)) {
+            hidePreview();
+        }
+    });
+    root.addEventListener('click', hidePreview);
+}
+
+// Prefetch the next pages in the navigation while the browser is idle.
+function prefetchNeighbours(url) {
+    const urls = Array.from(links, l => l.dataset.url);
+    const index = urls.indexOf(url);
+    const schedule = window.requestIdleCallback || (callback => setTimeout(callback, 200));
+    schedule(() => urls.slice(index + 1, index + 3).forEach(prefetch));
+}
+
+// Get the path (relative to the site root) of a page of this site, or null if url points
+// anywhere else. Pages come from the #page= hash too, so this must reject e.g. javascript:
+// urls and pages of other origins, which would otherwise run in the index.
+function sitePage(url) {
+    if (navUrls.has(url)) {
+        return url;
+    }
+    let resolved;
+    try {
+        resolved = new URL(url, siteRoot);
+    } catch (e) {
+        return null;
+    }
+    if (!['http:', 'https:', 'file:'].includes(resolved.protocol) || !resolved.href.startsWith(siteRoot)
+            || !resolved.pathname.endsWith('.html')) {
+        return null;
+    }
+    try {
+        return decodeURIComponent(resolved.href.slice(siteRoot.length).split('#')[0]);
+    } catch (e) {
+        return null;
+    }
+}
+
+function loadPage(url, pushHistory = true) {
+    url = sitePage(url) || 'home.html';
+    currentUrl = url;
+    setActiveLink(url);
+    if (pushHistory) {
+        history.pushState({ url: url }, '', '#page=' + encodeURIComponent(url));
+    }
+
+    if (contentMode !== 'fragments') {
+        // Replace the iframe's location so only pushState adds history entries; setting
+        // iframe.src would add one of its own and break Back/Forward.
+        if (iframe.contentWindow) {
+            iframe.contentWindow.location.replace(new URL(url, siteRoot).href);
+        } else {
+            iframe.src = url;
+        }
+        return;
+    }
+
+    // A slower earlier request may finish after this one, only show the current page.
+    fetchFragment(url)
+        .then(html => {
+            if (url === currentUrl) {
+                showFragment(url, html);
+            }
+        })
+        .catch(() => {
+            if (url === currentUrl) {
+                fragmentArea.textContent = `Unable to load ${url}.`;
+            }
+        });
+    prefetchNeighbours(url);
+}
+
+function pageFromLocation() {
+    const match = location.hash.match(/^#page=(.+)$/);
+    if (!match) {
+        return null;
+    }
+    try {
+        return sitePage(decodeURIComponent(match[1]));
+    } catch (e) {
+        return null;
+    }
+}
 
 links.forEach(link => {
-    link.addEventListener('click', (e) => {
-        e.preventDefault();
-        // Remove active class from all links
-        links.forEach(l => l.classList.remove('active'));
-        // Add active class to clicked link
-        link.classList.add('active');
-        // Load the selected page in the iframe
-        iframe.src = link.dataset.url;
+    const showPreview = () => schedulePreview(link, link.dataset.url, () => link.getBoundingClientRect());
+    link.addEventListener('mouseenter', () => {
+        prefetch(link.dataset.url);
+        showPreview();
+    });
+    link.addEventListener('focus', () => {
+        prefetch(link.dataset.url);
+        showPreview();
     });
+    link.addEventListener('mouseleave', hidePreview);
+    link.addEventListener('blur', hidePreview);
+    link.addEventListener('click', hidePreview);
+});
+
+watchLinkPreviews(fragmentArea);
+
+// The document in the iframe can only be reached when it is served from the same origin.
+iframe.addEventListener('load', () => {
+    hidePreview();
+    try {
+        if (iframe.contentDocument) {
+            watchLinkPreviews(iframe.contentDocument, iframe);
+        }
+    } catch (e) {
+        // Cross-origin document (e.g. opened from file://), no previews for its links.
+    }
 });
 
 document.querySelectorAll('.tree .folder').forEach(folder => {
@@ -22,7 +340,48 @@ document.querySelectorAll('.tree .folder').forEach(folder => {
 document.querySelectorAll('[data-url]').forEach(link => {
   link.addEventListener('click', e => {
     e.preventDefault();
-    const url = link.getAttribute('data-url');
-    document.getElementById('contentFrame').src = url;
+    loadPage(link.getAttribute('data-url'));
   });
 });
+
+// Keep in-page anchors and links between pages inside the index in fragment mode.
+fragmentArea.addEventListener('click', e => {
+    const link = e.target.closest('a[href]');
+    if (!link) {
+        return;
+    }
+    const href = link.getAttribute('href');
+    if (href.startsWith('#')) {
+        e.preventDefault();
+        const target = document.getElementById(decodeURIComponent(href.slice(1)));
+        if (target) {
+            target.scrollIntoView();
+        }
+        return;
+    }
+    if (link.href.startsWith(siteRoot) && link.pathname.endsWith('.html')) {
+        e.preventDefault();
+        loadPage(link.href.slice(siteRoot.length).split('#')[0]);
+    }
+});
+
+fragmentArea.addEventListener('mouseover', e => {
+    const link = e.target.closest('a[href]');
+    if (link && link.href.startsWith(siteRoot) && link.pathname.endsWith('.html')) {
+        prefetch(link.href.slice(siteRoot.length).split('#')[0]);
+    }
+});
+
+window.addEventListener('popstate', () => {
+    loadPage(pageFromLocation() || 'home.html', false);
+});
+
+if (contentMode === 'fragments') {
+    iframe.hidden = true;
+    fragmentArea.hidden = false;
+}
+
+const initialPage = pageFromLocation();
+if (initialPage || contentMode === 'fragments') {
+    loadPage(initialPage || 'home.html', false);
+}